@@ -0,0 +1,321 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import wave
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from catalog_diff import normalize_key
+from review_cache import LRUCache
+
+# Audio files are looked up in this directory, named after the songs
+# (e.g. "audio/晴天.wav"), or listed in its audio_map.json ({"song": "file"})
+AUDIO_DIR = "audio"
+AUDIO_MAP_FILE = "audio_map.json"
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.flac', '.m4a', '.ogg')
+
+# Clips are CLIP_SECONDS long and start CLIP_OFFSET seconds into the song
+# (or a third of the way in for short songs)
+CLIP_SECONDS = 5
+CLIP_OFFSET = 30
+
+# Trimmed clips are cached in memory and on disk
+CACHE_DIR = ".clip_cache"
+MEMORY_CACHE_SIZE = 32 * 1024 * 1024
+DISK_CACHE_SIZE = 256 * 1024 * 1024
+
+# While a question is answered, clips of the next PREFETCH_DEPTH questions are prepared
+PREFETCH_DEPTH = 3
+PREFETCH_WORKERS = 2
+
+# Players tried in order to play clips outside Windows
+CLIP_PLAYERS = ('afplay', 'paplay', 'aplay')
+
+# Errors that make a clip unavailable
+CLIP_ERRORS = (OSError, ValueError, EOFError, wave.Error, subprocess.SubprocessError)
+
+
+class AudioLibrary:
+    """Audio files of catalog songs found in a local directory."""
+
+    def __init__(self, songs: List[str], audio_dir: str = AUDIO_DIR):
+        """Map the audio files in `audio_dir` to catalog songs."""
+        self.audio_dir = audio_dir
+        self.files = self.scan(songs)
+
+    def scan(self, songs: List[str]) -> Dict[str, str]:
+        """Find the audio file of each song, by normalized file name or via the audio map."""
+        if not os.path.isdir(self.audio_dir):
+            return {}
+
+        song_keys = {normalize_key(song): song for song in songs}
+        song_names = set(songs)
+        files = {}
+        for entry in os.scandir(self.audio_dir):
+            stem, extension = os.path.splitext(entry.name)
+            if entry.is_file() and extension.lower() in AUDIO_EXTENSIONS:
+                song = song_keys.get(normalize_key(stem))
+                if song is not None:
+                    files[song] = entry.path
+
+        map_file = os.path.join(self.audio_dir, AUDIO_MAP_FILE)
+        try:
+            with open(map_file, 'r', encoding='utf-8') as f:
+                for song, file_name in json.load(f).items():
+                    if song in song_names:
+                        files[song] = os.path.join(self.audio_dir, file_name)
+        except FileNotFoundError:
+            pass
+        except json.JSONDecodeError:
+            print(f"Error: Invalid JSON in audio map file '{map_file}'!")
+
+        return files
+
+    def get_songs(self) -> List[str]:
+        """Get the songs that have an audio file."""
+        return list(self.files.keys())
+
+    def get_path(self, song: str) -> str:
+        """Get the audio file of a song."""
+        return self.files[song]
+
+
+def trim_clip(path: str, seconds: float = CLIP_SECONDS) -> bytes:
+    """Decode an audio file and cut a clip of `seconds` seconds, returned as WAV bytes.
+
+    WAV files are trimmed with the standard library; other formats need ffmpeg.
+    """
+    if os.path.splitext(path)[1].lower() == '.wav':
+        with wave.open(path, 'rb') as source:
+            rate = source.getframerate()
+            duration = source.getnframes() / rate
+            start = min(CLIP_OFFSET, duration / 3)
+            source.setpos(int(start * rate))
+            frames = source.readframes(int(seconds * rate))
+            params = source.getparams()
+
+        output = io.BytesIO()
+        with wave.open(output, 'wb') as clip:
+            clip.setparams(params)
+            clip.writeframes(frames)
+        return output.getvalue()
+
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg is None:
+        raise ValueError(f"ffmpeg is needed to decode '{path}'")
+
+    for start in (CLIP_OFFSET, 0):
+        completed = subprocess.run(
+            [ffmpeg, '-v', 'error', '-ss', str(start), '-t', str(seconds), '-i', path, '-f', 'wav', '-'],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+        # A song shorter than the offset gives an empty clip: start from the beginning instead
+        with wave.open(io.BytesIO(completed.stdout), 'rb') as clip:
+            if clip.getnframes() > 0:
+                return completed.stdout
+    raise ValueError(f"'{path}' contains no audio")
+
+
+class ClipCache:
+    """Size-bounded LRU cache of trimmed clips, in memory and on disk. Thread safe."""
+
+    def __init__(self, cache_dir: str = CACHE_DIR, max_memory: int = MEMORY_CACHE_SIZE,
+                 max_disk: int = DISK_CACHE_SIZE):
+        """Initialize the cache, picking up clips already cached on disk."""
+        self.cache_dir = cache_dir
+        self.max_disk = max_disk
+        self.memory = LRUCache(max_entries=4096, max_size=max_memory)
+        self.lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        # Disk entries in least recently used order, with their sizes
+        self.disk_files: OrderedDict = OrderedDict()
+        self.disk_size = 0
+        if os.path.isdir(cache_dir):
+            entries = sorted(os.scandir(cache_dir), key=lambda entry: entry.stat().st_mtime)
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith('.wav'):
+                    self.disk_files[entry.name[:-4]] = entry.stat().st_size
+                    self.disk_size += entry.stat().st_size
+
+    @staticmethod
+    def clip_key(path: str, seconds: float = CLIP_SECONDS) -> str:
+        """Cache key of a clip: changes when the audio file changes."""
+        stat = os.stat(path)
+        source = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{seconds}"
+        return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+    def disk_path(self, key: str) -> str:
+        """Path of a clip in the disk cache."""
+        return os.path.join(self.cache_dir, key + '.wav')
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Get a cached clip from memory, or from disk. Returns None on a miss."""
+        with self.lock:
+            data = self.memory.get(key)
+            if data is not None:
+                self.memory_hits += 1
+                return data
+            on_disk = key in self.disk_files
+            if on_disk:
+                self.disk_files.move_to_end(key)
+
+        if on_disk:
+            try:
+                with open(self.disk_path(key), 'rb') as f:
+                    data = f.read()
+                os.utime(self.disk_path(key))
+            except OSError:
+                data = None
+
+        with self.lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self.memory.put(key, data)
+            return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store a clip in memory and on disk, evicting the least recently used clips."""
+        with self.lock:
+            self.memory.put(key, data)
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(self.disk_path(key), 'wb') as f:
+                f.write(data)
+        except OSError as e:
+            print(f"Error caching clip: {e}")
+            return
+
+        evicted = []
+        with self.lock:
+            self.disk_size += len(data) - self.disk_files.pop(key, 0)
+            self.disk_files[key] = len(data)
+            while self.disk_size > self.max_disk and len(self.disk_files) > 1:
+                old_key, size = self.disk_files.popitem(last=False)
+                self.disk_size -= size
+                evicted.append(old_key)
+
+        for old_key in evicted:
+            try:
+                os.remove(self.disk_path(old_key))
+            except OSError:
+                pass
+
+    def hit_rate(self) -> float:
+        """Share of lookups answered from memory or disk."""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+
+
+class ClipPrefetcher:
+    """Prepares clips in a background thread pool so that the question loop never waits on decoding."""
+
+    def __init__(self, library: AudioLibrary, cache: Optional[ClipCache] = None,
+                 workers: int = PREFETCH_WORKERS, depth: int = PREFETCH_DEPTH):
+        """Start the thread pool."""
+        self.library = library
+        self.cache = cache or ClipCache()
+        self.depth = depth
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="clip-prefetch")
+        self.pending: Dict[str, Future] = {}
+        self.prefetch_latencies_ns: List[int] = []
+        self.wait_times_ns: List[int] = []
+        self.on_demand_loads = 0
+
+    def load_clip(self, song: str) -> bytes:
+        """Get the clip of a song from the cache, or trim and cache it. Runs in a worker thread."""
+        started_ns = time.perf_counter_ns()
+        path = self.library.get_path(song)
+        key = self.cache.clip_key(path)
+        data = self.cache.get(key)
+        if data is None:
+            data = trim_clip(path)
+            self.cache.put(key, data)
+        self.prefetch_latencies_ns.append(time.perf_counter_ns() - started_ns)
+        return data
+
+    def prefetch(self, songs: List[str]) -> None:
+        """Start preparing the clips of the given songs."""
+        for song in songs:
+            if song not in self.pending:
+                self.pending[song] = self.executor.submit(self.load_clip, song)
+
+    def prefetch_ahead(self, questions: List[Dict], index: int) -> None:
+        """Start preparing the clips of the questions after `index`."""
+        self.prefetch([question['song'] for question in questions[index + 1:index + 1 + self.depth]])
+
+    def get_clip(self, song: str) -> Optional[bytes]:
+        """Get the clip of a song, waiting for it if it is still being prepared."""
+        future = self.pending.pop(song, None)
+        if future is None:
+            self.on_demand_loads += 1
+            future = self.executor.submit(self.load_clip, song)
+
+        started_ns = time.perf_counter_ns()
+        try:
+            return future.result()
+        except CLIP_ERRORS as e:
+            print(f"Error preparing the clip of '{song}': {e}")
+            return None
+        finally:
+            self.wait_times_ns.append(time.perf_counter_ns() - started_ns)
+
+    def get_stats(self) -> Dict:
+        """Get cache and prefetch statistics."""
+        latencies = self.prefetch_latencies_ns
+        waits = self.wait_times_ns
+        return {
+            'cache_hit_rate': self.cache.hit_rate(),
+            'memory_hits': self.cache.memory_hits,
+            'disk_hits': self.cache.disk_hits,
+            'cache_misses': self.cache.misses,
+            'average_prefetch_latency_ns': sum(latencies) // len(latencies) if latencies else None,
+            'average_wait_ns': sum(waits) // len(waits) if waits else None,
+            'on_demand_loads': self.on_demand_loads
+        }
+
+    def close(self) -> None:
+        """Stop the thread pool, dropping clips that are no longer needed."""
+        for future in self.pending.values():
+            future.cancel()
+        self.pending.clear()
+        self.executor.shutdown(wait=False)
+
+
+def play_clip(data: bytes) -> bool:
+    """Start playing a WAV clip in the background. Returns False if no audio player is available."""
+    if os.name == 'nt':
+        import winsound
+        threading.Thread(target=winsound.PlaySound, args=(data, winsound.SND_MEMORY), daemon=True).start()
+        return True
+
+    player = next((shutil.which(name) for name in CLIP_PLAYERS if shutil.which(name)), None)
+    if player is None:
+        return False
+
+    # A new file per clip, so that the next clip never overwrites one still being played
+    with tempfile.NamedTemporaryFile(prefix="jay_chou_clip_", suffix=".wav", delete=False) as f:
+        f.write(data)
+    process = subprocess.Popen([player, f.name], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    threading.Thread(target=remove_when_done, args=(process, f.name), daemon=True).start()
+    return True
+
+
+def remove_when_done(process: subprocess.Popen, path: str) -> None:
+    """Wait for a player process to exit, then delete the clip file it played."""
+    process.wait()
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,185 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+from database_manager import DatabaseManager
+from jay_chou_quiz import JayChouQuiz
+from notes_manager import NotesManager
+from synthetic_catalog import generate_catalog, generate_notes
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_REPEAT = 5
+DEFAULT_OUTPUT = "benchmark_results.json"
+
+# A benchmark regresses when its best time grows by more than this factor
+DEFAULT_THRESHOLD = 1.25
+
+# Fast calls are looped until a sample takes at least this long, to get past timer noise
+MIN_SAMPLE_MS = 20
+
+# Questions per generated test, as in the quiz
+TEST_SIZE = 20
+
+
+def time_loops(func: Callable[[], object], loops: int) -> float:
+    """Time `loops` calls of a function, in milliseconds per call."""
+    started_ns = time.perf_counter_ns()
+    for _ in range(loops):
+        func()
+    return (time.perf_counter_ns() - started_ns) / 1e6 / loops
+
+
+def time_call(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Time a function over `repeat` samples, with its output silenced."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Find how many calls make up one sample
+        loops = 1
+        while time_loops(func, loops) * loops < MIN_SAMPLE_MS and loops < 1_000_000:
+            loops *= 10
+        timings = [time_loops(func, loops) for _ in range(repeat)]
+    return {
+        'min_ms': min(timings),
+        'median_ms': statistics.median(timings),
+        'max_ms': max(timings),
+        'loops': loops
+    }
+
+
+def answer_randomly(test_questions: List[Dict]) -> List[Dict]:
+    """Fill in random answers, so that grading sees a mix of right and wrong answers."""
+    for question in test_questions:
+        question['user_answer'] = random.choice(question['answer_choices'])
+    return test_questions
+
+
+def run_size(num_songs: int, repeat: int, work_dir: str) -> List[Dict]:
+    """Run every benchmark on a synthetic catalog of `num_songs` songs."""
+    catalog = generate_catalog(num_songs)
+    notes = generate_notes(catalog)
+    database_file = os.path.join(work_dir, f"catalog_{num_songs}.json")
+    notes_file = os.path.join(work_dir, f"notes_{num_songs}.json")
+    with open(database_file, 'w', encoding='utf-8') as f:
+        json.dump(catalog, f, ensure_ascii=False, indent=2)
+    with open(notes_file, 'w', encoding='utf-8') as f:
+        json.dump(notes, f, ensure_ascii=False, indent=2)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        quiz = JayChouQuiz(database_file)
+        manager = DatabaseManager(database_file)
+        notes_manager = NotesManager(notes_file)
+
+    test_questions = answer_randomly(quiz.generate_test(TEST_SIZE))
+    graded = quiz.grade_test(test_questions)
+    wrong_questions = graded['wrong_questions']
+    search_term = next(iter(notes["notes"]), "爱")[:2]
+
+    benchmarks = {
+        'quiz.create_song_mapping': quiz.create_song_mapping,
+        'quiz.generate_test': lambda: quiz.generate_test(TEST_SIZE),
+        'quiz.generate_retake_test': lambda: quiz.generate_retake_test(wrong_questions),
+        'quiz.grade_test': lambda: quiz.grade_test(test_questions),
+        'database_manager.load_database': manager.load_database,
+        'database_manager.save_database': manager.save_database,
+        'notes_manager.search_notes': lambda: notes_manager.find_notes(search_term),
+        'notes_manager.save_notes': notes_manager.save_notes,
+    }
+
+    results = []
+    for name, func in benchmarks.items():
+        timing = time_call(func, repeat)
+        results.append({'name': name, 'songs': num_songs, 'repeat': repeat, **timing})
+        print(f"{name:<36} {num_songs:>9,} songs  best {timing['min_ms']:10.4f} ms  median {timing['median_ms']:10.4f} ms")
+    return results
+
+
+def compare_results(results: List[Dict], baseline: List[Dict], threshold: float) -> List[Dict]:
+    """Compare results against a baseline. Returns the benchmarks that regressed."""
+    baseline_times = {(entry['name'], entry['songs']): entry['min_ms'] for entry in baseline}
+    regressions = []
+
+    print("\n" + "="*60)
+    print("COMPARISON WITH BASELINE")
+    print("="*60)
+    for entry in results:
+        baseline_ms = baseline_times.get((entry['name'], entry['songs']))
+        if baseline_ms is None:
+            continue
+        ratio = entry['min_ms'] / baseline_ms if baseline_ms > 0 else 1.0
+        status = "✗ REGRESSION" if ratio > threshold else "✓"
+        print(f"{entry['name']:<36} {entry['songs']:>9,} songs  {ratio:6.2f}x  {status}")
+        if ratio > threshold:
+            regressions.append({**entry, 'baseline_ms': baseline_ms, 'ratio': ratio})
+    return regressions
+
+
+def load_results(results_file: str) -> Optional[List[Dict]]:
+    """Load benchmark results from a JSON file."""
+    try:
+        with open(results_file, 'r', encoding='utf-8') as f:
+            return json.load(f)["results"]
+    except FileNotFoundError:
+        print(f"Error: Baseline file '{results_file}' not found!")
+    except (json.JSONDecodeError, KeyError):
+        print(f"Error: Invalid baseline file '{results_file}'!")
+    return None
+
+
+def main():
+    """Main function to run the benchmark suite."""
+    parser = argparse.ArgumentParser(description="Benchmark the quiz hot paths on synthetic catalogs.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="catalog sizes in songs (e.g. 1000 10000 1000000)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="runs per benchmark")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="JSON file to write results to")
+    parser.add_argument("--baseline", help="JSON results file to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="slowdown factor that counts as a regression")
+    args = parser.parse_args()
+
+    baseline = load_results(args.baseline) if args.baseline else None
+    if args.baseline and baseline is None:
+        sys.exit(2)
+
+    print("🎵 JAY CHOU QUIZ BENCHMARKS 🎵")
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        # The quiz keeps its side files (notes, leaderboards, ...) in the working directory
+        original_dir = os.getcwd()
+        os.chdir(work_dir)
+        try:
+            for num_songs in args.sizes:
+                results.extend(run_size(num_songs, args.repeat, work_dir))
+        finally:
+            os.chdir(original_dir)
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'repeat': args.repeat
+        },
+        'results': results
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nResults saved to '{args.output}'")
+
+    if baseline is not None:
+        regressions = compare_results(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmarks regressed by more than {args.threshold:.2f}x!")
+            sys.exit(1)
+        print("\nNo regressions.")
+
+if __name__ == "__main__":
+    main()
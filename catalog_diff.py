@@ -0,0 +1,216 @@
+import argparse
+import json
+import unicodedata
+from typing import Dict, List, Optional
+
+from database_manager import DatabaseManager
+from notes_manager import NotesManager
+
+
+def normalize_key(name: str) -> str:
+    """Normalize a song or album name for matching (width, case and whitespace insensitive)."""
+    return " ".join(unicodedata.normalize("NFKC", name).casefold().split())
+
+
+def load_catalog(catalog_file: str) -> Dict:
+    """Load a catalog snapshot from a JSON file."""
+    try:
+        with open(catalog_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print(f"Error: Catalog file '{catalog_file}' not found!")
+        return {"albums": {}}
+    except json.JSONDecodeError:
+        print(f"Error: Invalid JSON in catalog file '{catalog_file}'!")
+        return {"albums": {}}
+
+
+def diff_album_songs(local_songs: List[str], upstream_songs: List[str]) -> Dict:
+    """Compute the song-level delta between two versions of the same album.
+
+    Songs whose names only differ in width, case or spacing are renames;
+    any other difference is an addition and a removal.
+    """
+    local_keys = {normalize_key(song): (i, song) for i, song in enumerate(local_songs)}
+    upstream_keys = {normalize_key(song): (i, song) for i, song in enumerate(upstream_songs)}
+
+    renamed = {}
+    added = {}
+    for key, (track, song) in upstream_keys.items():
+        match = local_keys.get(key)
+        if match is None:
+            added[track] = song
+        elif match[1] != song:
+            # Same song, spelled differently upstream
+            renamed[match[1]] = song
+
+    # Songs are only renamed on a normalized name match: a local-only song and an
+    # upstream-only song at the same track may be unrelated (e.g. a local addition)
+    removed = [song for key, (_, song) in local_keys.items() if key not in upstream_keys]
+
+    return {
+        'added': [added[track] for track in sorted(added)],
+        'removed': removed,
+        'renamed': renamed
+    }
+
+
+def diff_catalogs(local: Dict, upstream: Dict) -> Dict:
+    """Compute the album- and song-level delta that turns `local` into `upstream`.
+
+    Albums and songs are matched on their normalized names through hash maps,
+    so the diff runs in time linear in the size of both catalogs. Song-level
+    changes are keyed by the local album name.
+    """
+    local_albums = {normalize_key(album): album for album in local["albums"]}
+    upstream_albums = {normalize_key(album): album for album in upstream["albums"]}
+    local_years = local.get("album_years", {})
+    upstream_years = upstream.get("album_years", {})
+
+    diff = {
+        'added_albums': {},
+        'removed_albums': [],
+        'renamed_albums': {},
+        'added_songs': {},
+        'removed_songs': {},
+        'renamed_songs': {},
+        'album_years': {}
+    }
+
+    for key, upstream_name in upstream_albums.items():
+        local_name = local_albums.get(key)
+        if local_name is None:
+            diff['added_albums'][upstream_name] = list(upstream["albums"][upstream_name])
+        else:
+            if local_name != upstream_name:
+                diff['renamed_albums'][local_name] = upstream_name
+
+            song_diff = diff_album_songs(local["albums"][local_name], upstream["albums"][upstream_name])
+            if song_diff['added']:
+                diff['added_songs'][local_name] = song_diff['added']
+            if song_diff['removed']:
+                diff['removed_songs'][local_name] = song_diff['removed']
+            if song_diff['renamed']:
+                diff['renamed_songs'][local_name] = song_diff['renamed']
+
+        if upstream_name in upstream_years and local_years.get(local_name) != upstream_years[upstream_name]:
+            diff['album_years'][upstream_name] = upstream_years[upstream_name]
+
+    for key, local_name in local_albums.items():
+        if key not in upstream_albums:
+            diff['removed_albums'].append(local_name)
+
+    return diff
+
+
+def is_empty_diff(diff: Dict) -> bool:
+    """Check whether a diff contains no changes."""
+    return not any(diff.values())
+
+
+def apply_diff(diff: Dict, manager: DatabaseManager, notes_manager: Optional[NotesManager] = None,
+               prune: bool = False) -> Dict[str, int]:
+    """Apply a diff as a batch through the database manager's edit operations.
+
+    Notes follow renamed songs when a notes manager is given. Removals are
+    only applied with `prune`, so local additions survive an upstream merge.
+    Returns the number of changes of each kind that were applied.
+    """
+    counts = {'renamed_songs': 0, 'moved_notes': 0, 'added_songs': 0, 'removed_songs': 0,
+              'renamed_albums': 0, 'added_albums': 0, 'removed_albums': 0}
+
+    # Song-level changes first, while albums still have their local names
+    for album_name, renames in diff['renamed_songs'].items():
+        counts['renamed_songs'] += manager.rename_songs(album_name, renames)
+        if notes_manager is not None:
+            for old_song, new_song in renames.items():
+                counts['moved_notes'] += notes_manager.rename_note(old_song, new_song)
+
+    for album_name, songs in diff['added_songs'].items():
+        counts['added_songs'] += manager.add_songs(album_name, songs)
+
+    if prune:
+        for album_name, songs in diff['removed_songs'].items():
+            counts['removed_songs'] += manager.remove_songs(album_name, songs)
+
+    # Then album-level changes
+    counts['renamed_albums'] += manager.rename_albums(diff['renamed_albums'])
+
+    for album_name, songs in diff['added_albums'].items():
+        counts['added_albums'] += manager.add_album(album_name, songs)
+        counts['added_songs'] += len(songs)
+
+    if prune:
+        for album_name in diff['removed_albums']:
+            counts['removed_albums'] += manager.delete_album(album_name)
+
+    manager.set_album_years(diff['album_years'])
+
+    return counts
+
+
+def display_diff(diff: Dict) -> None:
+    """Display a summary of the changes in a diff."""
+    print("\n" + "="*60)
+    print("CATALOG DIFF")
+    print("="*60)
+
+    if is_empty_diff(diff):
+        print("Catalogs are identical.")
+        return
+
+    for album_name, songs in diff['added_albums'].items():
+        print(f"+ 📀 {album_name} ({len(songs)} songs)")
+    for album_name in diff['removed_albums']:
+        print(f"- 📀 {album_name}")
+    for old_name, new_name in diff['renamed_albums'].items():
+        print(f"~ 📀 {old_name} → {new_name}")
+
+    for album_name, songs in diff['added_songs'].items():
+        for song in songs:
+            print(f"+ {song} (to {album_name})")
+    for album_name, songs in diff['removed_songs'].items():
+        for song in songs:
+            print(f"- {song} (from {album_name})")
+    for album_name, renames in diff['renamed_songs'].items():
+        for old_song, new_song in renames.items():
+            print(f"~ {old_song} → {new_song} (in {album_name})")
+
+    for album_name, year in diff['album_years'].items():
+        print(f"~ 📅 {album_name}: {year}")
+
+
+def main():
+    """Main function to diff and merge catalog snapshots."""
+    parser = argparse.ArgumentParser(description="Diff and merge Jay Chou catalog snapshots.")
+    parser.add_argument("upstream", help="updated catalog file to merge from")
+    parser.add_argument("--local", default="jay_chou_database.json", help="local catalog file to merge into")
+    parser.add_argument("--notes", default=None, help="notes file whose notes follow renamed songs")
+    parser.add_argument("--apply", action="store_true", help="apply the changes and save the local catalog")
+    parser.add_argument("--prune", action="store_true", help="also remove songs and albums missing upstream")
+    args = parser.parse_args()
+
+    print("🎵 JAY CHOU CATALOG DIFF 🎵")
+
+    manager = DatabaseManager(args.local)
+    diff = diff_catalogs(manager.data, load_catalog(args.upstream))
+    display_diff(diff)
+
+    if not args.apply or is_empty_diff(diff):
+        return
+
+    notes_manager = NotesManager(args.notes) if args.notes else NotesManager()
+    counts = apply_diff(diff, manager, notes_manager, prune=args.prune)
+
+    print(f"\nAdded {counts['added_albums']} albums and {counts['added_songs']} songs.")
+    print(f"Renamed {counts['renamed_albums']} albums and {counts['renamed_songs']} songs.")
+    if args.prune:
+        print(f"Removed {counts['removed_albums']} albums and {counts['removed_songs']} songs.")
+
+    manager.save_database()
+    if counts['moved_notes']:
+        print(f"Moved {counts['moved_notes']} notes to renamed songs.")
+        notes_manager.save_notes()
+
+if __name__ == "__main__":
+    main()
@@ -29,6 +29,68 @@ class DatabaseManager:
         except Exception as e:
             print(f"Error saving database: {e}")
     
+    def add_album(self, album_name: str, songs: List[str]) -> bool:
+        """Add a new album with its songs. Returns False if the album already exists."""
+        if album_name in self.data["albums"]:
+            return False
+        self.data["albums"][album_name] = list(dict.fromkeys(songs))
+        return True
+    
+    def add_songs(self, album_name: str, songs: List[str]) -> int:
+        """Append songs to an existing album, skipping duplicates. Returns the number added."""
+        album_songs = self.data["albums"][album_name]
+        existing_songs = set(album_songs)
+        added = 0
+        for song in songs:
+            if song not in existing_songs:
+                album_songs.append(song)
+                existing_songs.add(song)
+                added += 1
+        return added
+    
+    def remove_songs(self, album_name: str, songs: List[str]) -> int:
+        """Remove songs from an album in a single pass. Returns the number removed."""
+        to_remove = set(songs)
+        album_songs = self.data["albums"][album_name]
+        kept = [song for song in album_songs if song not in to_remove]
+        self.data["albums"][album_name] = kept
+        return len(album_songs) - len(kept)
+    
+    def rename_songs(self, album_name: str, renames: Dict[str, str]) -> int:
+        """Rename songs of an album in place, keeping track order. Returns the number renamed."""
+        album_songs = self.data["albums"][album_name]
+        renamed = 0
+        for i, song in enumerate(album_songs):
+            if song in renames:
+                album_songs[i] = renames[song]
+                renamed += 1
+        return renamed
+    
+    def rename_albums(self, renames: Dict[str, str]) -> int:
+        """Rename albums in a single pass, keeping album order. Returns the number renamed."""
+        renamed = sum(1 for album_name in renames if album_name in self.data["albums"])
+        if renamed:
+            self.data["albums"] = {renames.get(album_name, album_name): songs
+                                   for album_name, songs in self.data["albums"].items()}
+            album_years = self.data.get("album_years", {})
+            for old_name, new_name in renames.items():
+                if old_name in album_years:
+                    album_years[new_name] = album_years.pop(old_name)
+        return renamed
+    
+    def set_album_years(self, album_years: Dict[str, int]) -> None:
+        """Set the release years of albums."""
+        if album_years:
+            self.data.setdefault("album_years", {}).update(album_years)
+    
+    def delete_album(self, album_name: str) -> bool:
+        """Delete an album. Returns False if the album does not exist."""
+        if album_name not in self.data["albums"]:
+            return False
+        del self.data["albums"][album_name]
+        self.data.get("album_years", {}).pop(album_name, None)
+        return True
+    
     def display_all_albums(self) -> None:
         """Display all albums and their songs."""
         print("\n" + "="*60)
@@ -161,7 +223,7 @@ class DatabaseManager:
         # Confirm removal
         confirm = input(f"\nAre you sure you want to remove '{song_to_remove}' from '{album_name}'? (y/n): ").strip().lower()
         if confirm in ['y', 'yes']:
-            self.data["albums"][album_name].remove(song_to_remove)
+            self.remove_songs(album_name, [song_to_remove])
             print(f"Removed '{song_to_remove}' from '{album_name}'")
         else:
             print("Removal cancelled.")
@@ -199,7 +261,7 @@ class DatabaseManager:
         song_count = len(self.data["albums"][album_name])
         confirm = input(f"\nAre you sure you want to remove '{album_name}' with {song_count} songs? (y/n): ").strip().lower()
         if confirm in ['y', 'yes']:
-            del self.data["albums"][album_name]
+            self.delete_album(album_name)
             print(f"Removed album '{album_name}'")
         else:
             print("Removal cancelled.")
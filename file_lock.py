@@ -0,0 +1,33 @@
+import os
+from contextlib import contextmanager
+from typing import Iterator
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+
+@contextmanager
+def locked(path: str) -> Iterator[None]:
+    """Hold an exclusive lock for a file shared between processes.
+
+    The lock is taken on a side file (`path` + ".lock"), so the file itself
+    can be appended to or replaced while the lock is held.
+    """
+    with open(path + ".lock", 'a+b') as lock_file:
+        if os.name == 'nt':
+            # LK_LOCK retries for 10 seconds before raising OSError
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
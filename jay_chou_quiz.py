@@ -1,19 +1,65 @@
 import json
 import random
 import os
-from typing import List, Dict, Tuple
+import time
+from typing import List, Dict, Optional
 
 # Import the NotesManager
 from notes_manager import NotesManager
+from question_types import (MAX_CHOICES, MIN_CHOICES, NUM_CHOICES, QUESTION_GENERATORS, build_indexes,
+                            required_indexes)
+from quiz_timer import seconds_to_ns, timed_input
+from review_cache import AlbumReviewCache
+from leaderboards import GLOBAL_BOARD, LeaderboardStore
+from practice_recommender import PracticeRecommender
+from audio_clips import AUDIO_DIR, CLIP_SECONDS, AudioLibrary, ClipPrefetcher, play_clip
+from results_export import HISTORY_FILE, ExportWorker, append_session, session_record
+
+# Question type used by the classic quiz
+DEFAULT_QUESTION_TYPE = "album"
+
+# Share of a correct answer's points that depends on answer speed in timed mode
+TIME_BONUS_WEIGHT = 0.5
+
+# A test stops drawing songs after this many draws per requested question, when
+# few songs can be asked about with the chosen question types
+MAX_DRAWS_PER_QUESTION = 100
 
 class JayChouQuiz:
-    def __init__(self, database_file: str = "jay_chou_database.json"):
-        """Initialize the quiz with the database file."""
+    def __init__(self, database_file: str = "jay_chou_database.json", question_types: Optional[List[str]] = None,
+                 player: str = "player", num_choices: int = NUM_CHOICES, catalog=None):
+        """Initialize the quiz with the database file, or with a SharedCatalog built by another process."""
         self.database_file = database_file
-        self.data = self.load_database()
-        self.song_to_album = self.create_song_mapping()
+        self.player = player
+        if catalog is None:
+            self.data = self.load_database()
+            self.song_to_album = self.create_song_mapping()
+            prebuilt = {"song_to_album": self.song_to_album}
+        else:
+            # The shared catalog provides every index as a view of shared memory
+            prebuilt = catalog.indexes()
+            self.data = {"albums": prebuilt["album_songs"]}
+            self.song_to_album = prebuilt["song_to_album"]
+        # Build the indexes needed by all registered question types once, and share them
+        self.indexes = build_indexes(self.data, required_indexes(QUESTION_GENERATORS) + ["song_albums"],
+                                     prebuilt=prebuilt)
+        self.generators = {name: cls(self.indexes) for name, cls in QUESTION_GENERATORS.items()}
+        self.set_num_choices(num_choices)
+        self.question_types = question_types or [DEFAULT_QUESTION_TYPE]
         # Initialize notes manager
         self.notes_manager = NotesManager()
+        # Rendered album review pages, invalidated per album when a note changes
+        self.review_cache = AlbumReviewCache(self.notes_manager, self.indexes["song_albums"],
+                                             self.render_album_review)
+        # Global and per-album leaderboards, kept across runs
+        self.leaderboards = LeaderboardStore()
+        # Co-error statistics used to recommend songs to practice
+        self.recommender = PracticeRecommender()
+        # Local audio files for clip questions
+        self.audio_library = AudioLibrary(self.get_all_songs(), AUDIO_DIR)
+        # Graded sessions are appended to the history file in the background
+        self.history_file = HISTORY_FILE
+        self.export_worker = ExportWorker()
         
     def load_database(self) -> Dict:
         """Load the database from JSON file."""
@@ -41,47 +87,69 @@ class JayChouQuiz:
     
     def get_all_songs(self) -> List[str]:
         """Get all song names."""
-        return list(self.song_to_album.keys())
+        return self.indexes["songs"]
     
-    def generate_question(self) -> Tuple[str, str, List[str]]:
-        """Generate a single question with 4 answer choices."""
-        # Randomly select a song
-        song = random.choice(self.get_all_songs())
-        correct_album = self.song_to_album[song]
-        
-        # Get 3 wrong albums (excluding the correct one)
-        all_albums = self.get_all_albums()
-        wrong_albums = [album for album in all_albums if album != correct_album]
-        wrong_choices = random.sample(wrong_albums, 3)
-        
-        # Create answer choices and shuffle them
-        answer_choices = wrong_choices + [correct_album]
-        random.shuffle(answer_choices)
-        
-        return song, correct_album, answer_choices
+    def get_question_types(self) -> List[str]:
+        """Get the names of all registered question types."""
+        return list(self.generators.keys())
     
-    def generate_test(self, num_questions: int) -> List[Dict]:
+    def set_num_choices(self, num_choices: int) -> None:
+        """Set the number of answer choices of every question type."""
+        if not MIN_CHOICES <= num_choices <= MAX_CHOICES:
+            raise ValueError(f"The number of answer choices must be between {MIN_CHOICES} and {MAX_CHOICES}")
+        self.num_choices = num_choices
+        for generator in self.generators.values():
+            generator.num_choices = num_choices
+    
+    def generate_question(self, song: Optional[str] = None, question_types: Optional[List[str]] = None) -> Optional[Dict]:
+        """Generate a single question using one of the given question types.
+        
+        Returns None if none of them can be asked about the song (or the catalog is empty).
+        """
+        if song is None:
+            if not self.get_all_songs():
+                return None
+            song = random.choice(self.get_all_songs())
+        
+        # Pick a random question type that can be asked about this song
+        candidates = [self.generators[name] for name in (question_types or self.question_types)
+                      if self.generators[name].supports(song)]
+        if not candidates:
+            return None
+        
+        return random.choice(candidates).build(song)
+    
+    def generate_test(self, num_questions: int, question_types: Optional[List[str]] = None) -> List[Dict]:
         """Generate a complete test with the specified number of questions."""
-        if num_questions > len(self.get_all_songs()):
-            print(f"Warning: Requested {num_questions} questions but only {len(self.get_all_songs())} songs available.")
-            num_questions = len(self.get_all_songs())
+        all_songs = self.get_all_songs()
+        if num_questions > len(all_songs):
+            print(f"Warning: Requested {num_questions} questions but only {len(all_songs)} songs available.")
+            num_questions = len(all_songs)
+        
+        # Skip the types the catalog cannot ask about at all, instead of trying every song
+        question_types = [name for name in (question_types or self.question_types) if self.generators[name].can_ask()]
+        if not question_types:
+            return []
         
         test_questions = []
         used_songs = set()
+        max_draws = MAX_DRAWS_PER_QUESTION * num_questions
+        draws = 0
         
-        while len(test_questions) < num_questions:
-            song, correct_album, answer_choices = self.generate_question()
+        # Sample songs in batches; every question type goes through the same path
+        while len(test_questions) < num_questions and len(used_songs) < len(all_songs) and draws < max_draws:
+            batch = random.sample(all_songs, num_questions - len(test_questions))
+            draws += len(batch)
             
-            # Avoid duplicate songs in the same test
-            if song not in used_songs:
-                test_questions.append({
-                    'song': song,
-                    'correct_album': correct_album,
-                    'answer_choices': answer_choices,
-                    'user_answer': None,
-                    'is_correct': None
-                })
+            for song in batch:
+                # Avoid duplicate songs in the same test
+                if song in used_songs:
+                    continue
                 used_songs.add(song)
+                
+                question = self.generate_question(song, question_types)
+                if question is not None:
+                    test_questions.append(question)
         
         return test_questions
     
@@ -90,38 +158,52 @@ class JayChouQuiz:
         retake_questions = []
         
         for wrong_question in wrong_questions:
-            # Create new answer choices for the same song
-            song = wrong_question['song']
-            correct_album = wrong_question['correct_answer']
-            
-            # Get 3 wrong albums (excluding the correct one)
-            all_albums = self.get_all_albums()
-            wrong_albums = [album for album in all_albums if album != correct_album]
-            wrong_choices = random.sample(wrong_albums, 3)
-            
-            # Create answer choices and shuffle them
-            answer_choices = wrong_choices + [correct_album]
-            random.shuffle(answer_choices)
-            
-            retake_questions.append({
-                'song': song,
-                'correct_album': correct_album,
-                'answer_choices': answer_choices,
-                'user_answer': None,
-                'is_correct': None,
-                'original_wrong_answer': wrong_question['user_answer']  # Keep track of original wrong answer
-            })
+            # Create new answer choices for the same song and question type
+            question_type = wrong_question.get('type', DEFAULT_QUESTION_TYPE)
+            question = self.generators[question_type].build(wrong_question['song'])
+            question['original_wrong_answer'] = wrong_question['user_answer']  # Keep track of original wrong answer
+            retake_questions.append(question)
         
         return retake_questions
     
+    def generate_audio_test(self, num_questions: int) -> List[Dict]:
+        """Generate a test of "which album is this clip from" questions about songs with audio."""
+        audio_songs = self.audio_library.get_songs()
+        if num_questions > len(audio_songs):
+            print(f"Warning: Requested {num_questions} questions but only {len(audio_songs)} songs have audio.")
+            num_questions = len(audio_songs)
+        
+        test_questions = []
+        for song in random.sample(audio_songs, num_questions):
+            question = self.generate_question(song, [DEFAULT_QUESTION_TYPE])
+            if question is not None:
+                question['prompt'] = f"Which album is this {CLIP_SECONDS}-second clip from?"
+                question['clip'] = True
+                test_questions.append(question)
+        return test_questions
+    
+    def generate_practice_test(self, num_questions: int, player: Optional[str] = None,
+                               question_types: Optional[List[str]] = None) -> List[Dict]:
+        """Generate a test on the songs the player is most likely to get wrong next."""
+        test_questions = []
+        for song in self.recommender.recommend(player or self.player, num_questions):
+            if song in self.song_to_album:
+                question = self.generate_question(song, question_types)
+                if question is not None:
+                    test_questions.append(question)
+        return test_questions
+    
     def display_question(self, question: Dict, question_num: int, is_retake: bool = False) -> None:
         """Display a single question to the user."""
         print(f"\n{'='*60}")
         print(f"Question {question_num}:")
-        print(f"Which album does the song '{question['song']}' belong to?")
+        print(question['prompt'])
         
         if is_retake and 'original_wrong_answer' in question:
-            print(f"⚠️  You previously answered: {question['original_wrong_answer']}")
+            if question['original_wrong_answer'] is None:
+                print("⚠️  You previously ran out of time")
+            else:
+                print(f"⚠️  You previously answered: {question['original_wrong_answer']}")
         
         print()
         
@@ -132,16 +214,53 @@ class JayChouQuiz:
     
     def get_user_answer(self, question: Dict) -> str:
         """Get and validate user's answer."""
+        num_choices = len(question['answer_choices'])
         while True:
             try:
-                choice = input("Enter your answer (1-4): ").strip()
-                if choice in ['1', '2', '3', '4']:
-                    choice_index = int(choice) - 1
-                    return question['answer_choices'][choice_index]
+                choice = int(input(f"Enter your answer (1-{num_choices}): ").strip())
+                if 1 <= choice <= num_choices:
+                    return question['answer_choices'][choice - 1]
                 else:
-                    print("Please enter a number between 1 and 4.")
-            except (ValueError, IndexError):
-                print("Please enter a valid number between 1 and 4.")
+                    print(f"Please enter a number between 1 and {num_choices}.")
+            except ValueError:
+                print(f"Please enter a valid number between 1 and {num_choices}.")
+    
+    def get_timed_answer(self, question: Dict, time_limit: float, round_deadline_ns: Optional[int] = None) -> Optional[str]:
+        """Get the user's answer before the deadline, recording the answer latency on the question.
+        
+        Returns None if the question or the round runs out of time.
+        """
+        start_ns = time.perf_counter_ns()
+        deadline_ns = start_ns + seconds_to_ns(time_limit)
+        if round_deadline_ns is not None:
+            deadline_ns = min(deadline_ns, round_deadline_ns)
+        
+        num_choices = len(question['answer_choices'])
+        valid_choices = [str(i) for i in range(1, num_choices + 1)]
+        answer = None
+        while True:
+            remaining_ns = deadline_ns - time.perf_counter_ns()
+            if remaining_ns <= 0:
+                break
+            
+            choice = timed_input(f"Enter your answer (1-{num_choices}) [{remaining_ns / 1e9:.0f}s left]: ",
+                                 remaining_ns / 1e9)
+            if choice is None:
+                break
+            
+            choice = choice.strip()
+            if choice in valid_choices:
+                answer = question['answer_choices'][int(choice) - 1]
+                break
+            print(f"Please enter a number between 1 and {num_choices}.")
+        
+        question['latency_ns'] = time.perf_counter_ns() - start_ns
+        question['timed_out'] = answer is None
+        question['time_limit'] = time_limit
+        
+        if answer is None:
+            print("⏰ Time's up!")
+        return answer
     
     def offer_note_creation(self, song: str, album: str) -> None:
         """Offer to create a note for a song after getting it correct on retake."""
@@ -169,35 +288,69 @@ class JayChouQuiz:
         wrong_questions = []
         
         for question in test_questions:
-            is_correct = question['user_answer'] == question['correct_album']
+            is_correct = question['user_answer'] == question['correct_answer']
             if is_correct:
                 correct_count += 1
             else:
                 # Store wrong questions for potential retake
                 wrong_questions.append({
+                    'type': question['type'],
                     'song': question['song'],
                     'user_answer': question['user_answer'],
-                    'correct_answer': question['correct_album'],
+                    'correct_answer': question['correct_answer'],
                     'is_correct': is_correct
                 })
             
             results.append({
+                'type': question['type'],
                 'song': question['song'],
                 'user_answer': question['user_answer'],
-                'correct_answer': question['correct_album'],
-                'is_correct': is_correct
+                'correct_answer': question['correct_answer'],
+                'is_correct': is_correct,
+                'latency_ns': question.get('latency_ns')
             })
         
         total_questions = len(test_questions)
         percentage = (correct_count / total_questions) * 100 if total_questions > 0 else 0
         
-        return {
+        graded = {
             'total_questions': total_questions,
             'correct_count': correct_count,
             'percentage': percentage,
             'results': results,
             'wrong_questions': wrong_questions
         }
+        
+        # Timed tests record a latency on every question
+        if test_questions and 'latency_ns' in test_questions[0]:
+            graded.update(self.score_timing(test_questions))
+        
+        return graded
+    
+    def score_timing(self, test_questions: List[Dict]) -> Dict:
+        """Score a timed test: faster correct answers earn more points."""
+        points = 0.0
+        latencies = []
+        timed_out_count = 0
+        
+        for question in test_questions:
+            if question['timed_out']:
+                timed_out_count += 1
+                continue
+            
+            latencies.append(question['latency_ns'])
+            if question['user_answer'] == question['correct_answer']:
+                speed = 1.0
+                if question.get('time_limit'):
+                    speed = max(0.0, 1 - question['latency_ns'] / seconds_to_ns(question['time_limit']))
+                points += (1 - TIME_BONUS_WEIGHT) + TIME_BONUS_WEIGHT * speed
+        
+        return {
+            'timed': True,
+            'timed_score': points / len(test_questions) * 100,
+            'timed_out_count': timed_out_count,
+            'average_latency_ns': sum(latencies) // len(latencies) if latencies else None
+        }
     
     def display_results(self, results: Dict) -> None:
         """Display test results with detailed feedback."""
@@ -223,6 +376,14 @@ class JayChouQuiz:
         
         print(f"Grade: {grade}")
         
+        if results.get('timed'):
+            if results['average_latency_ns'] is not None:
+                print(f"Average answer time: {results['average_latency_ns'] / 1e9:.2f}s")
+            print(f"Timed out: {results['timed_out_count']}")
+            print(f"Timed score: {results['timed_score']:.1f}")
+            if 'round_time_ns' in results:
+                print(f"Round time: {results['round_time_ns'] / 1e9:.1f}s")
+        
         # Show retake option if there are wrong questions
         if results['wrong_questions']:
             print(f"\n📝 You got {len(results['wrong_questions'])} questions wrong.")
@@ -235,13 +396,107 @@ class JayChouQuiz:
         for i, result in enumerate(results['results'], 1):
             status = "✓ CORRECT" if result['is_correct'] else "✗ WRONG"
             print(f"\n{i}. {result['song']}")
-            print(f"   Your answer: {result['user_answer']}")
+            if result['user_answer'] is None:
+                print("   Your answer: ⏰ (timed out)")
+            else:
+                print(f"   Your answer: {result['user_answer']}")
             
             if not result['is_correct']:
                 print(f"   Correct answer: {result['correct_answer']}")
             
+            if result['latency_ns'] is not None:
+                print(f"   Time: {result['latency_ns'] / 1e9:.2f}s")
+            
             print(f"   Status: {status}")
     
+    def record_results(self, results: Dict, player: Optional[str] = None) -> Dict:
+        """Record graded results on the leaderboards and in the co-error statistics, and save them.
+        
+        Returns the leaderboard ranks per board.
+        """
+        self.export_session(results, "test", player)
+        
+        ranks = self.leaderboards.record(results, self.song_to_album)
+        
+        if results['wrong_questions']:
+            self.recommender.record(player or self.player, results['wrong_questions'])
+        
+        return ranks
+    
+    def export_session(self, results: Dict, kind: str = "test", player: Optional[str] = None) -> None:
+        """Queue a graded session for appending to the history file."""
+        record = session_record(results, player or self.player, kind)
+        self.export_worker.submit(append_session, record, self.history_file)
+    
+    def close(self) -> None:
+        """Finish pending background work and compact the leaderboard and co-error logs."""
+        self.export_worker.close()
+        self.leaderboards.close()
+        self.recommender.close()
+    
+    def display_ranks(self, ranks: Dict) -> None:
+        """Display the leaderboard ranks of a test."""
+        if not ranks:
+            return
+        
+        print(f"\n{'='*60}")
+        print("🏆 LEADERBOARDS")
+        print(f"{'='*60}")
+        rank, total = ranks[GLOBAL_BOARD]
+        print(f"Global rank: #{rank} of {total}")
+        for album, (rank, total) in ranks.items():
+            if album != GLOBAL_BOARD:
+                print(f"📀 {album}: #{rank} of {total}")
+    
+    def run_audio_test(self, test_questions: List[Dict]) -> None:
+        """Run a clip test, preparing the next clips in the background while the user answers."""
+        prefetcher = ClipPrefetcher(self.audio_library)
+        prefetcher.prefetch_ahead(test_questions, -1)
+        
+        try:
+            for i, question in enumerate(test_questions):
+                prefetcher.prefetch_ahead(test_questions, i)
+                self.display_question(question, i + 1)
+                
+                clip = prefetcher.get_clip(question['song'])
+                if clip is None:
+                    print("⚠️  This clip is unavailable, answer from the song title instead:")
+                    print(f"'{question['song']}'")
+                elif not play_clip(clip):
+                    print("⚠️  No audio player found (install aplay, paplay or afplay).")
+                
+                question['user_answer'] = self.get_user_answer(question)
+        finally:
+            stats = prefetcher.get_stats()
+            prefetcher.close()
+        
+        print(f"\nClip cache hit rate: {stats['cache_hit_rate'] * 100:.1f}% "
+              f"({stats['memory_hits']} memory, {stats['disk_hits']} disk, {stats['cache_misses']} misses)")
+        if stats['average_prefetch_latency_ns'] is not None:
+            print(f"Average clip preparation time: {stats['average_prefetch_latency_ns'] / 1e6:.1f} ms")
+            print(f"Average wait for a clip: {stats['average_wait_ns'] / 1e6:.1f} ms")
+    
+    def run_timed_test(self, test_questions: List[Dict], time_limit: float, round_time_limit: Optional[float] = None) -> None:
+        """Run a test with a per-question deadline and an optional overall round deadline."""
+        round_deadline_ns = None
+        if round_time_limit is not None:
+            round_deadline_ns = time.perf_counter_ns() + seconds_to_ns(round_time_limit)
+        
+        for i, question in enumerate(test_questions, 1):
+            if round_deadline_ns is not None and time.perf_counter_ns() >= round_deadline_ns:
+                # The round is over: the remaining questions count as timed out
+                question['user_answer'] = None
+                question['latency_ns'] = 0
+                question['timed_out'] = True
+                question['time_limit'] = time_limit
+                continue
+            
+            self.display_question(question, i)
+            question['user_answer'] = self.get_timed_answer(question, time_limit, round_deadline_ns)
+        
+        if round_deadline_ns is not None and time.perf_counter_ns() >= round_deadline_ns:
+            print("\n⏰ The round is over!")
+    
     def run_retake_quiz(self, wrong_questions: List[Dict]) -> None:
         """Run a retake quiz with only the questions that were answered incorrectly."""
         if not wrong_questions:
@@ -265,11 +520,15 @@ class JayChouQuiz:
             question['user_answer'] = self.get_user_answer(question)
             
             # Offer note creation for correct answers
-            if question['user_answer'] == question['correct_album']:
+            if question['user_answer'] == question['correct_answer']:
                 self.offer_note_creation(question['song'], question['correct_album'])
         
         # Grade and display retake results
         retake_results = self.grade_test(retake_questions)
+        self.export_session(retake_results, "retake")
+        # Songs still missed together on a retake feed the co-error statistics too
+        if retake_results['wrong_questions']:
+            self.recommender.record(self.player, retake_results['wrong_questions'])
         
         print(f"\n{'='*60}")
         print("🔄 RETAKE RESULTS")
@@ -304,6 +563,26 @@ class JayChouQuiz:
             
             print(f"   Status: {status}")
     
+    def run_practice_quiz(self, practice_questions: List[Dict]) -> None:
+        """Run a practice quiz on recommended songs."""
+        print(f"\n{'='*60}")
+        print("🎯 PRACTICE QUIZ - SONGS YOU'RE LIKELY TO GET WRONG")
+        print(f"{'='*60}")
+        print(f"You will practice {len(practice_questions)} songs that are often missed together with your mistakes.")
+        print("\nPress Enter to start the practice...")
+        input()
+        
+        for i, question in enumerate(practice_questions, 1):
+            self.display_question(question, i)
+            question['user_answer'] = self.get_user_answer(question)
+        
+        # Practice results only feed the co-error statistics, not the leaderboards
+        practice_results = self.grade_test(practice_questions)
+        self.export_session(practice_results, "practice")
+        if practice_results['wrong_questions']:
+            self.recommender.record(self.player, practice_results['wrong_questions'])
+        self.display_results(practice_results)
+    
     def review_album(self) -> None:
         """Allow user to review a specific album and its songs."""
         print(f"\n{'='*60}")
@@ -331,20 +610,28 @@ class JayChouQuiz:
                 print("Please enter a valid number!")
         
         # Display album details
-        songs = self.data["albums"][selected_album]
+        print(self.get_album_review(selected_album))
+        
         print(f"\n{'='*60}")
-        print(f"📀 {selected_album} - {len(songs)} songs")
-        print(f"{'='*60}")
+        print("Album review complete!")
+    
+    def get_album_review(self, album: str) -> str:
+        """Get the review page of an album (its songs joined with notes), from the cache when possible."""
+        return self.review_cache.get_page(album, self.data["albums"][album])
+    
+    @staticmethod
+    def render_album_review(album: str, songs: List[str], notes: Dict[str, str]) -> str:
+        """Render the review page of an album."""
+        lines = [f"\n{'='*60}", f"📀 {album} - {len(songs)} songs", f"{'='*60}"]
         
         for i, song in enumerate(songs, 1):
-            note = self.notes_manager.get_note(song)
+            note = notes.get(song)
             if note:
-                print(f"{i:2d}. {song} 💡 {note}")
+                lines.append(f"{i:2d}. {song} 💡 {note}")
             else:
-                print(f"{i:2d}. {song}")
+                lines.append(f"{i:2d}. {song}")
         
-        print(f"\n{'='*60}")
-        print("Album review complete!")
+        return "\n".join(lines)
     
     def run_quiz(self) -> None:
         """Run the complete quiz interface."""
@@ -364,21 +651,102 @@ class JayChouQuiz:
             except ValueError:
                 print("Please enter a valid number.")
         
+        # Get question mode
+        print("\nQuestion types:")
+        print("1. Classic (which album does the song belong to)")
+        print("2. Mixed (" + ", ".join(generator.label for generator in self.generators.values()) + ")")
+        has_audio = bool(self.audio_library.get_songs())
+        if has_audio:
+            print(f"3. Audio clips (which album is this {CLIP_SECONDS}-second clip from)")
+        mode_count = 3 if has_audio else 2
+        audio_mode = False
+        while True:
+            mode = input(f"Select question types (1-{mode_count}): ").strip()
+            if mode == "1":
+                question_types = [DEFAULT_QUESTION_TYPE]
+                break
+            elif mode == "2":
+                question_types = self.get_question_types()
+                break
+            elif mode == "3" and has_audio:
+                question_types = [DEFAULT_QUESTION_TYPE]
+                audio_mode = True
+                break
+            else:
+                print(f"Please enter a number between 1 and {mode_count}.")
+        
+        # Get number of answer choices
+        while True:
+            try:
+                num_choices = input(f"How many answer choices per question? ({MIN_CHOICES}-{MAX_CHOICES}, "
+                                    f"press Enter for {self.num_choices}): ").strip()
+                if num_choices:
+                    self.set_num_choices(int(num_choices))
+                break
+            except ValueError:
+                print(f"Please enter a number between {MIN_CHOICES} and {MAX_CHOICES}.")
+        
+        # Get timed mode settings (clip tests are untimed)
+        time_limit = None
+        round_time_limit = None
+        while not audio_mode:
+            try:
+                seconds = input("Seconds per question for timed mode (press Enter for untimed): ").strip()
+                if seconds:
+                    time_limit = float(seconds)
+                    if time_limit <= 0:
+                        print("Please enter a positive number.")
+                        continue
+                break
+            except ValueError:
+                print("Please enter a valid number.")
+        
+        while time_limit is not None:
+            try:
+                seconds = input("Round time limit in seconds (press Enter for no limit): ").strip()
+                if seconds:
+                    round_time_limit = float(seconds)
+                    if round_time_limit <= 0:
+                        print("Please enter a positive number.")
+                        continue
+                break
+            except ValueError:
+                print("Please enter a valid number.")
+        
         print(f"\nGenerating {num_questions} questions...")
-        test_questions = self.generate_test(num_questions)
+        if audio_mode:
+            test_questions = self.generate_audio_test(num_questions)
+        else:
+            test_questions = self.generate_test(num_questions, question_types)
         
-        print(f"\nTest ready! You will be asked to identify which album each song belongs to.")
+        if not test_questions:
+            print("\nThe catalog does not have enough albums and songs to ask these questions.")
+            print("Add more with the database manager and try again.")
+            return
+        
+        if audio_mode:
+            print(f"\nTest ready! You will hear a clip of each song and identify its album.")
+        elif question_types == [DEFAULT_QUESTION_TYPE]:
+            print(f"\nTest ready! You will be asked to identify which album each song belongs to.")
+        else:
+            print(f"\nTest ready! You will be asked a mix of questions about each song.")
         print("Press Enter to start the test...")
         input()
         
         # Run the test
-        for i, question in enumerate(test_questions, 1):
-            self.display_question(question, i)
-            question['user_answer'] = self.get_user_answer(question)
+        if audio_mode:
+            self.run_audio_test(test_questions)
+        elif time_limit is None:
+            for i, question in enumerate(test_questions, 1):
+                self.display_question(question, i)
+                question['user_answer'] = self.get_user_answer(question)
+        else:
+            self.run_timed_test(test_questions, time_limit, round_time_limit)
         
         # Grade and display results
         results = self.grade_test(test_questions)
         self.display_results(results)
+        self.display_ranks(self.record_results(results))
         
         # Ask if user wants to retake wrong questions
         if results['wrong_questions']:
@@ -387,6 +755,14 @@ class JayChouQuiz:
             if retake_choice in ['y', 'yes']:
                 self.run_retake_quiz(results['wrong_questions'])
         
+        # Ask if user wants to practice the songs they are likely to get wrong next
+        practice_questions = self.generate_practice_test(5, question_types=question_types)
+        if practice_questions:
+            print(f"\n{'='*60}")
+            practice_choice = input("Would you like to practice songs you're likely to get wrong next? (y/n): ").strip().lower()
+            if practice_choice in ['y', 'yes']:
+                self.run_practice_quiz(practice_questions)
+        
         # Ask if user wants to review an album
         print(f"\n{'='*60}")
         review_choice = input("Would you like to review an album? (y/n): ").strip().lower()
@@ -415,7 +791,10 @@ def main():
     print(f"Total songs: {len(quiz.get_all_songs())}")
     print()
     
-    quiz.run_quiz()
+    try:
+        quiz.run_quiz()
+    finally:
+        quiz.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,311 @@
+import os
+import struct
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from file_lock import locked
+
+# Scores are percentages, bucketed to 0.1% (1001 buckets from 0.0 to 100.0)
+SCORE_BUCKETS = 1001
+
+# Name of the leaderboard that every test is recorded on
+GLOBAL_BOARD = "*"
+
+# File layout: magic and format version, then records of a board's UTF-8 name
+# (u16 length + bytes), a u16 number of pairs and (u16 bucket, u32 count) pairs.
+# Counts of all records of a board add up, so a graded test is saved by
+# appending one single-pair record per board
+FILE_MAGIC = b"JCLB"
+FILE_VERSION = 2
+HEADER = struct.Struct("<4sH")
+NAME_LENGTH = struct.Struct("<H")
+PAIR_COUNT = struct.Struct("<H")
+PAIR = struct.Struct("<HI")
+
+# Boards with at most this many non-empty buckets are ranked by summing them,
+# larger ones through a Fenwick tree
+SPARSE_RANK_LIMIT = 32
+
+# The log is compacted to one record per board when it holds more records than
+# COMPACT_FACTOR per board plus COMPACT_SLACK
+COMPACT_FACTOR = 4
+COMPACT_SLACK = 256
+
+
+def score_bucket(percentage: float) -> int:
+    """Map a percentage to its score bucket."""
+    return min(max(int(round(percentage * 10)), 0), SCORE_BUCKETS - 1)
+
+
+class FenwickTree:
+    """Fenwick (binary indexed) tree of counts: O(log n) updates and prefix sums."""
+
+    def __init__(self, size: int):
+        """Initialize a tree of `size` zero counts."""
+        self.size = size
+        self.tree = array('Q', bytes(8 * (size + 1)))
+
+    @classmethod
+    def from_counts(cls, counts: array) -> "FenwickTree":
+        """Build a tree from raw counts in O(n)."""
+        fenwick = cls(len(counts))
+        tree = fenwick.tree
+        for i in range(1, fenwick.size + 1):
+            tree[i] += counts[i - 1]
+            parent = i + (i & -i)
+            if parent <= fenwick.size:
+                tree[parent] += tree[i]
+        return fenwick
+
+    def add(self, index: int, delta: int) -> None:
+        """Add `delta` to the count at `index`."""
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix_sum(self, index: int) -> int:
+        """Sum of the counts at positions 0..index."""
+        total = 0
+        i = index + 1
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+
+class Leaderboard:
+    """Score distribution of one leaderboard, with O(log n) insert and rank queries.
+
+    Bucket counts are kept sparse, and the Fenwick tree is only built once
+    the board has more than SPARSE_RANK_LIMIT non-empty buckets, so the many
+    small per-album boards stay cheap.
+    """
+
+    def __init__(self, counts: Optional[Dict[int, int]] = None):
+        """Initialize the leaderboard from bucket counts, or empty."""
+        self.counts: Dict[int, int] = dict(counts or {})
+        self.total = sum(self.counts.values())
+        self.fenwick: Optional[FenwickTree] = None
+
+    def add_count(self, bucket: int, count: int = 1) -> None:
+        """Add `count` scores to a bucket."""
+        self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.total += count
+        if self.fenwick is not None:
+            self.fenwick.add(bucket, count)
+
+    def add(self, percentage: float) -> int:
+        """Record a score and return its rank."""
+        self.add_count(score_bucket(percentage))
+        return self.rank(percentage)
+
+    def rank(self, percentage: float) -> int:
+        """Rank of a score: 1 + the number of recorded scores strictly higher."""
+        bucket = score_bucket(percentage)
+        if self.fenwick is None and len(self.counts) <= SPARSE_RANK_LIMIT:
+            return 1 + sum(count for other, count in self.counts.items() if other > bucket)
+
+        if self.fenwick is None:
+            dense = array('Q', bytes(8 * SCORE_BUCKETS))
+            for other, count in self.counts.items():
+                dense[other] = count
+            self.fenwick = FenwickTree.from_counts(dense)
+        return self.total - self.fenwick.prefix_sum(bucket) + 1
+
+
+def encode_record(name: str, pairs: Iterable[Tuple[int, int]]) -> bytes:
+    """Encode a board record of (bucket, count) pairs."""
+    pairs = list(pairs)
+    encoded_name = name.encode('utf-8')
+    return b"".join([NAME_LENGTH.pack(len(encoded_name)), encoded_name, PAIR_COUNT.pack(len(pairs))]
+                    + [PAIR.pack(bucket, count) for bucket, count in pairs])
+
+
+class LeaderboardStore:
+    """Global and per-album leaderboards, persisted in a compact binary log.
+
+    The file holds records of each board's non-empty buckets, and every graded
+    test appends a few bytes per board it is recorded on. All file access holds
+    a lock and first reads what other processes appended, so processes sharing
+    the file never overwrite each other's scores. The log is compacted back to
+    one record per board when it grows, and at `close`.
+    """
+
+    def __init__(self, leaderboard_file: str = "leaderboards.bin"):
+        """Initialize the store and load the leaderboards from file."""
+        self.leaderboard_file = leaderboard_file
+        self.boards: Dict[str, Leaderboard] = {}
+        # Bytes of the file applied to `boards`, the identity of that file, and its number of records
+        self.offset = 0
+        self.file_id: Optional[Tuple[int, int]] = None
+        self.record_count = 0
+        # Set when the file is invalid: it is rewritten instead of appended to
+        self.needs_rewrite = False
+        with locked(self.leaderboard_file):
+            self.sync()
+
+    def reset(self) -> None:
+        """Forget the loaded leaderboards."""
+        self.boards = {}
+        self.offset = 0
+        self.file_id = None
+        self.record_count = 0
+
+    def sync(self) -> None:
+        """Apply the records appended to the file since the last sync. Call with the lock held."""
+        try:
+            with open(self.leaderboard_file, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                file_id = (stat.st_dev, stat.st_ino)
+                if self.needs_rewrite and file_id == self.file_id:
+                    # Still the invalid file: it is replaced on the next save
+                    return
+                if file_id != self.file_id or stat.st_size < self.offset:
+                    # New file, or replaced by another process's compaction: read it all
+                    self.reset()
+                    self.file_id = file_id
+                f.seek(self.offset)
+                blob = f.read()
+        except FileNotFoundError:
+            self.reset()
+            return
+
+        try:
+            self.offset += self.apply_records(blob, self.offset == 0)
+        except (struct.error, ValueError, UnicodeDecodeError):
+            print(f"Error: Invalid leaderboard file '{self.leaderboard_file}'!")
+            self.reset()
+            self.file_id = file_id
+            self.needs_rewrite = True
+
+    def apply_records(self, blob: bytes, with_header: bool) -> int:
+        """Add the counts of the records in a blob to the boards. Returns the number of bytes read."""
+        offset = 0
+        if with_header and blob:
+            magic, version = HEADER.unpack_from(blob, 0)
+            if magic != FILE_MAGIC or version != FILE_VERSION:
+                raise ValueError("unknown file format")
+            offset = HEADER.size
+
+        while offset < len(blob):
+            (name_length,) = NAME_LENGTH.unpack_from(blob, offset)
+            offset += NAME_LENGTH.size
+            name = blob[offset:offset + name_length].decode('utf-8')
+            offset += name_length
+            (pair_count,) = PAIR_COUNT.unpack_from(blob, offset)
+            offset += PAIR_COUNT.size
+
+            board = self.get_board(name)
+            for _ in range(pair_count):
+                bucket, count = PAIR.unpack_from(blob, offset)
+                offset += PAIR.size
+                if bucket >= SCORE_BUCKETS:
+                    raise ValueError("invalid score bucket")
+                board.add_count(bucket, count)
+            self.record_count += 1
+        return offset
+
+    def append_records(self, records: List[bytes]) -> None:
+        """Append records to the file. Call with the lock held, after `sync`."""
+        if self.needs_rewrite:
+            self.compact()
+            return
+
+        data = b"".join(records)
+        if self.offset == 0:
+            data = HEADER.pack(FILE_MAGIC, FILE_VERSION) + data
+        try:
+            with open(self.leaderboard_file, 'ab') as f:
+                f.write(data)
+                stat = os.fstat(f.fileno())
+        except Exception as e:
+            print(f"Error saving leaderboards: {e}")
+            return
+
+        self.file_id = (stat.st_dev, stat.st_ino)
+        self.offset += len(data)
+        self.record_count += len(records)
+
+    def compact(self) -> None:
+        """Rewrite the file with one record per board, replacing it atomically. Call with the lock held."""
+        chunks = [HEADER.pack(FILE_MAGIC, FILE_VERSION)]
+        for name, board in self.boards.items():
+            chunks.append(encode_record(name, sorted(board.counts.items())))
+
+        temp_file = self.leaderboard_file + ".tmp"
+        try:
+            with open(temp_file, 'wb') as f:
+                f.write(b"".join(chunks))
+            os.replace(temp_file, self.leaderboard_file)
+            stat = os.stat(self.leaderboard_file)
+        except Exception as e:
+            print(f"Error saving leaderboards: {e}")
+            return
+
+        self.file_id = (stat.st_dev, stat.st_ino)
+        self.offset = stat.st_size
+        self.record_count = len(self.boards)
+        self.needs_rewrite = False
+
+    def should_compact(self) -> bool:
+        """Check whether the log has grown enough to be worth compacting."""
+        return self.record_count > COMPACT_FACTOR * len(self.boards) + COMPACT_SLACK
+
+    def get_board(self, name: str) -> Leaderboard:
+        """Get a leaderboard, creating it if needed."""
+        board = self.boards.get(name)
+        if board is None:
+            board = self.boards[name] = Leaderboard()
+        return board
+
+    def record(self, results: Dict, song_to_album: Dict[str, str]) -> Dict[str, Tuple[int, int]]:
+        """Record graded test results on the global board and on the board of every album asked about.
+
+        The scores are appended to the file right away. Returns the (rank, total
+        entries) of the test on each board it was recorded on, counting the
+        scores recorded by other processes.
+        """
+        if not results['total_questions']:
+            return {}
+
+        scores = [(GLOBAL_BOARD, results['percentage'])]
+
+        # Per-album score: share of this album's questions answered correctly
+        album_scores: Dict[str, List[int]] = {}
+        for result in results['results']:
+            album = song_to_album.get(result['song'])
+            if album is None:
+                continue
+            score = album_scores.setdefault(album, [0, 0])
+            score[0] += result['is_correct']
+            score[1] += 1
+        scores.extend((album, correct / total * 100) for album, (correct, total) in album_scores.items())
+
+        ranks = {}
+        with locked(self.leaderboard_file):
+            self.sync()
+            records = []
+            for name, percentage in scores:
+                board = self.get_board(name)
+                ranks[name] = (board.add(percentage), board.total)
+                records.append(encode_record(name, [(score_bucket(percentage), 1)]))
+            self.append_records(records)
+            if self.should_compact():
+                self.compact()
+
+        return ranks
+
+    def rank(self, name: str, percentage: float) -> Tuple[int, int]:
+        """Get the (rank, total entries) a score would have on a leaderboard."""
+        board = self.boards.get(name)
+        if board is None:
+            return 1, 0
+        return board.rank(percentage), board.total
+
+    def close(self) -> None:
+        """Compact the log to one record per board."""
+        with locked(self.leaderboard_file):
+            self.sync()
+            if self.record_count > len(self.boards) or self.needs_rewrite:
+                self.compact()
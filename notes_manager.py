@@ -1,12 +1,14 @@
 import json
 import os
-from typing import Dict, List
+from typing import Callable, Dict, List, Tuple
 
 class NotesManager:
     def __init__(self, notes_file: str = "song_notes_billydatabase.json"):
         """Initialize the notes manager."""
         self.notes_file = notes_file
         self.notes = self.load_notes()
+        # Called with the song whose note changed, e.g. to invalidate cached pages
+        self.listeners: List[Callable[[str], None]] = []
     
     def load_notes(self) -> Dict:
         """Load notes from JSON file."""
@@ -29,12 +31,26 @@ class NotesManager:
         except Exception as e:
             print(f"Error saving notes: {e}")
     
+    def add_listener(self, listener: Callable[[str], None]) -> None:
+        """Register a callback called with the song whose note changed."""
+        self.listeners.append(listener)
+    
+    def mark_changed(self, song: str) -> None:
+        """Notify listeners that a song's note changed."""
+        for listener in self.listeners:
+            listener(song)
+    
+    def get_notes(self) -> Dict[str, str]:
+        """Get the mapping of song names to notes."""
+        return self.notes.get("notes", {})
+    
     def add_note(self, song: str, note: str) -> None:
         """Add a note for a specific song."""
         if "notes" not in self.notes:
             self.notes["notes"] = {}
         
         self.notes["notes"][song] = note
+        self.mark_changed(song)
         print(f"Note added for '{song}': {note}")
     
     def get_note(self, song: str) -> str:
@@ -49,10 +65,20 @@ class NotesManager:
             return False
         return song in self.notes["notes"]
     
+    def rename_note(self, old_song: str, new_song: str) -> bool:
+        """Move a note to a renamed song. Returns False if there was no note to move."""
+        if not self.has_note(old_song) or self.has_note(new_song):
+            return False
+        self.notes["notes"][new_song] = self.notes["notes"].pop(old_song)
+        self.mark_changed(old_song)
+        self.mark_changed(new_song)
+        return True
+    
     def remove_note(self, song: str) -> None:
         """Remove a note for a specific song."""
         if "notes" in self.notes and song in self.notes["notes"]:
             del self.notes["notes"][song]
+            self.mark_changed(song)
             print(f"Note removed for '{song}'")
         else:
             print(f"No note found for '{song}'")
@@ -169,6 +195,15 @@ class NotesManager:
         else:
             print("Removal cancelled.")
     
+    def find_notes(self, search_term: str) -> List[Tuple[str, str]]:
+        """Find the (song, note) pairs whose song or note contains the search term."""
+        search_term = search_term.lower()
+        found_notes = []
+        for song, note in self.get_notes().items():
+            if search_term in song.lower() or search_term in note.lower():
+                found_notes.append((song, note))
+        return found_notes
+    
     def search_notes(self) -> None:
         """Search for notes containing specific text."""
         print("\n" + "="*60)
@@ -184,10 +219,7 @@ class NotesManager:
             print("Search term cannot be empty!")
             return
         
-        found_notes = []
-        for song, note in self.notes["notes"].items():
-            if search_term in song.lower() or search_term in note.lower():
-                found_notes.append((song, note))
+        found_notes = self.find_notes(search_term)
         
         if found_notes:
             print(f"\nFound {len(found_notes)} matching notes:")
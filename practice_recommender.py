@@ -0,0 +1,391 @@
+import heapq
+import os
+import struct
+import sys
+from array import array
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from file_lock import locked
+
+# Each wrong answer is paired with at most this many earlier wrong answers of
+# the same test, so recording a test costs O(number of wrong answers)
+CO_ERROR_WINDOW = 8
+
+# Number of recent wrong songs remembered per user
+HISTORY_LENGTH = 20
+
+# Open-addressing hash table of song pairs
+EMPTY_KEY = 0xFFFFFFFFFFFFFFFF
+INITIAL_CAPACITY = 1024
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+
+# File layout: a snapshot (header, song and user names as u16 length + UTF-8,
+# per-song error counts, the hash table arrays as they are in memory, the row
+# column lists, then each user's recent wrong songs), followed by the graded
+# tests recorded since, each as the player name, a u16 number of wrong songs
+# and their names
+FILE_MAGIC = b"JCCE"
+FILE_VERSION = 2
+HEADER = struct.Struct("<4sHIIII")
+NAME_LENGTH = struct.Struct("<H")
+SONG_COUNT = struct.Struct("<H")
+
+# The snapshot is rewritten once this many tests have been appended after it
+COMPACT_TESTS = 1000
+
+
+def encode_name(name: str) -> bytes:
+    """Encode a name as u16 length + UTF-8 bytes."""
+    encoded_name = name.encode('utf-8')
+    return NAME_LENGTH.pack(len(encoded_name)) + encoded_name
+
+
+def read_name(blob: bytes, offset: int) -> Tuple[str, int]:
+    """Read a name encoded by `encode_name`. Returns the name and the offset after it."""
+    (name_length,) = NAME_LENGTH.unpack_from(blob, offset)
+    offset += NAME_LENGTH.size
+    if offset + name_length > len(blob):
+        raise ValueError("truncated file")
+    return blob[offset:offset + name_length].decode('utf-8'), offset + name_length
+
+
+def pair_key(song_id: int, other_id: int) -> int:
+    """Pack an ordered pair of song ids into a single 64-bit key."""
+    return (song_id << 32) | other_id
+
+
+class CoErrorMatrix:
+    """Sparse song-to-song co-error counts stored in compact arrays.
+
+    Counts live in an open-addressing hash table (`keys`/`counts` arrays) and
+    every row keeps an array of its non-zero columns, so a row can be read
+    without scanning the whole matrix.
+    """
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        """Initialize an empty matrix."""
+        self.keys = array('Q', [EMPTY_KEY]) * capacity
+        self.counts = array('I', bytes(4 * capacity))
+        self.mask = capacity - 1
+        self.size = 0
+        self.rows: List[array] = []
+
+    def slot(self, key: int) -> int:
+        """Find the slot holding `key`, or the empty slot where it belongs."""
+        i = ((key * HASH_MULTIPLIER) & EMPTY_KEY) >> 32 & self.mask
+        keys = self.keys
+        while keys[i] != key and keys[i] != EMPTY_KEY:
+            i = (i + 1) & self.mask
+        return i
+
+    def get(self, song_id: int, other_id: int) -> int:
+        """Get the co-error count of two songs."""
+        i = self.slot(pair_key(song_id, other_id))
+        return self.counts[i] if self.keys[i] != EMPTY_KEY else 0
+
+    def add(self, song_id: int, other_id: int, delta: int = 1) -> None:
+        """Add to the co-error count of an ordered pair of songs."""
+        key = pair_key(song_id, other_id)
+        i = self.slot(key)
+        if self.keys[i] == EMPTY_KEY:
+            self.keys[i] = key
+            self.size += 1
+            while len(self.rows) <= song_id:
+                self.rows.append(array('I'))
+            self.rows[song_id].append(other_id)
+            if self.size * 2 > len(self.keys):
+                self.counts[i] = delta
+                self.grow()
+                return
+        self.counts[i] += delta
+
+    def grow(self) -> None:
+        """Double the hash table capacity."""
+        old_keys, old_counts = self.keys, self.counts
+        capacity = len(old_keys) * 2
+        self.keys = array('Q', [EMPTY_KEY]) * capacity
+        self.counts = array('I', bytes(4 * capacity))
+        self.mask = capacity - 1
+        for key, count in zip(old_keys, old_counts):
+            if key != EMPTY_KEY:
+                i = self.slot(key)
+                self.keys[i] = key
+                self.counts[i] = count
+
+    def row(self, song_id: int) -> List[Tuple[int, int]]:
+        """Get the (other song id, count) pairs of a row."""
+        if song_id >= len(self.rows):
+            return []
+        return [(other_id, self.get(song_id, other_id)) for other_id in self.rows[song_id]]
+
+    @classmethod
+    def from_arrays(cls, keys: array, counts: array, size: int, rows: List[array]) -> "CoErrorMatrix":
+        """Rebuild a matrix from its saved arrays without rehashing."""
+        matrix = cls(0)
+        matrix.keys = keys
+        matrix.counts = counts
+        matrix.mask = len(keys) - 1
+        matrix.size = size
+        matrix.rows = rows
+        return matrix
+
+
+class PracticeRecommender:
+    """Recommends songs to practice from co-error statistics of graded tests.
+
+    Songs that are often answered wrong in the same test as a user's recent
+    mistakes are the ones they are likely to get wrong next.
+
+    Statistics are saved as a snapshot followed by the graded tests recorded
+    since, so recording a test appends O(number of wrong answers) bytes. The
+    snapshot is rewritten every COMPACT_TESTS tests and at `close`. File access
+    holds a lock and first replays the tests appended by other processes.
+    """
+
+    def __init__(self, stats_file: str = "co_errors.bin"):
+        """Initialize the recommender and load the statistics from file."""
+        self.stats_file = stats_file
+        self.reset()
+        with locked(self.stats_file):
+            self.sync()
+
+    def reset(self) -> None:
+        """Forget all statistics."""
+        self.song_ids: Dict[str, int] = {}
+        self.songs: List[str] = []
+        self.error_counts = array('I')
+        self.matrix = CoErrorMatrix()
+        self.histories: Dict[str, Deque[int]] = {}
+        # Bytes of the file applied to the statistics, the identity of that file,
+        # and the number of tests appended after its snapshot
+        self.offset = 0
+        self.file_id: Optional[Tuple[int, int]] = None
+        self.logged_tests = 0
+
+    def song_id(self, song: str) -> int:
+        """Get the id of a song, assigning a new one if needed."""
+        song_id = self.song_ids.get(song)
+        if song_id is None:
+            song_id = self.song_ids[song] = len(self.songs)
+            self.songs.append(song)
+            self.error_counts.append(0)
+        return song_id
+
+    def record(self, player: str, wrong_questions: List[Dict]) -> None:
+        """Update the statistics with the wrong answers of a graded test, and append them to the file."""
+        songs = [wrong_question['song'] for wrong_question in wrong_questions]
+        with locked(self.stats_file):
+            self.sync()
+            self.add_test(player, songs)
+            self.append_test(player, songs)
+            if self.logged_tests >= COMPACT_TESTS:
+                self.save_stats()
+
+    def add_test(self, player: str, songs: List[str]) -> None:
+        """Update the statistics with the wrong songs of a graded test, in question order."""
+        history = self.histories.get(player)
+        if history is None:
+            history = self.histories[player] = deque(maxlen=HISTORY_LENGTH)
+
+        test_ids = []
+        for song in songs:
+            song_id = self.song_id(song)
+            self.error_counts[song_id] += 1
+            for other_id in test_ids[-CO_ERROR_WINDOW:]:
+                if other_id != song_id:
+                    self.matrix.add(song_id, other_id)
+                    self.matrix.add(other_id, song_id)
+            test_ids.append(song_id)
+            history.append(song_id)
+
+    def recommend(self, player: str, k: int = 5) -> List[str]:
+        """Get the top-k songs the player should practice.
+
+        Candidates are the co-error neighbours of the player's recent mistakes,
+        weighted by co-error count; only those rows of the matrix are read.
+        Recent mistakes themselves are recommended last, by error count.
+        """
+        history = self.histories.get(player)
+        if not history or k <= 0:
+            return []
+
+        recent = set(history)
+        scores: Dict[int, int] = {}
+        for song_id in recent:
+            for other_id, count in self.matrix.row(song_id):
+                if other_id not in recent:
+                    scores[other_id] = scores.get(other_id, 0) + count
+
+        # Bounded heap of the k best candidates
+        heap: List[Tuple[int, int, int]] = []
+        for other_id, score in scores.items():
+            entry = (score, self.error_counts[other_id], -other_id)
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+        best = [-entry[2] for entry in sorted(heap, reverse=True)]
+
+        if len(best) < k:
+            fallback = heapq.nlargest(k - len(best), recent, key=lambda song_id: self.error_counts[song_id])
+            best.extend(fallback)
+
+        return [self.songs[song_id] for song_id in best]
+
+    def sync(self) -> None:
+        """Apply what was written to the file since the last sync. Call with the lock held."""
+        try:
+            with open(self.stats_file, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                file_id = (stat.st_dev, stat.st_ino)
+                if file_id != self.file_id or stat.st_size < self.offset:
+                    # New file, or a new snapshot written by another process: read it all
+                    self.reset()
+                    self.file_id = file_id
+                f.seek(self.offset)
+                blob = f.read()
+        except FileNotFoundError:
+            self.reset()
+            return
+
+        try:
+            offset = self.load_snapshot(blob) if self.offset == 0 else 0
+            self.offset += self.replay_tests(blob, offset)
+        except (struct.error, ValueError, UnicodeDecodeError):
+            print(f"Error: Invalid co-error statistics file '{self.stats_file}'!")
+            # Start over; the invalid file is replaced by the next snapshot
+            self.reset()
+            self.file_id = file_id
+            self.offset = stat.st_size
+            self.logged_tests = COMPACT_TESTS
+
+    def load_snapshot(self, blob: bytes) -> int:
+        """Load the statistics from the snapshot at the start of the file. Returns its size in bytes."""
+        magic, version, song_count, capacity, pair_count, user_count = HEADER.unpack_from(blob, 0)
+        if magic != FILE_MAGIC or version != FILE_VERSION or not capacity or capacity & (capacity - 1):
+            raise ValueError("unknown file format")
+        offset = HEADER.size
+
+        names = []
+        for _ in range(song_count + user_count):
+            name, offset = read_name(blob, offset)
+            names.append(name)
+
+        error_counts = self.read_array('I', blob, offset, song_count)
+        offset += 4 * song_count
+        keys = self.read_array('Q', blob, offset, capacity)
+        offset += 8 * capacity
+        counts = self.read_array('I', blob, offset, capacity)
+        offset += 4 * capacity
+        row_lengths = self.read_array('I', blob, offset, song_count)
+        offset += 4 * song_count
+        row_columns = self.read_array('I', blob, offset, pair_count)
+        offset += 4 * pair_count
+        history_lengths = self.read_array('H', blob, offset, user_count)
+        offset += 2 * user_count
+        history_ids = self.read_array('I', blob, offset, sum(history_lengths))
+        offset += 4 * len(history_ids)
+
+        self.songs = names[:song_count]
+        self.song_ids = {song: i for i, song in enumerate(self.songs)}
+        self.error_counts = error_counts
+
+        rows = []
+        start = 0
+        for length in row_lengths:
+            rows.append(row_columns[start:start + length])
+            start += length
+        self.matrix = CoErrorMatrix.from_arrays(keys, counts, pair_count, rows)
+
+        start = 0
+        for player, length in zip(names[song_count:], history_lengths):
+            self.histories[player] = deque(history_ids[start:start + length], maxlen=HISTORY_LENGTH)
+            start += length
+        return offset
+
+    def replay_tests(self, blob: bytes, offset: int) -> int:
+        """Apply the tests recorded in a blob from `offset`. Returns the offset after the last one."""
+        while offset < len(blob):
+            player, offset = read_name(blob, offset)
+            (song_count,) = SONG_COUNT.unpack_from(blob, offset)
+            offset += SONG_COUNT.size
+            songs = []
+            for _ in range(song_count):
+                song, offset = read_name(blob, offset)
+                songs.append(song)
+            self.add_test(player, songs)
+            self.logged_tests += 1
+        return offset
+
+    @staticmethod
+    def read_array(typecode: str, blob: bytes, offset: int, length: int) -> array:
+        """Read a little-endian array from a byte blob."""
+        values = array(typecode)
+        values.frombytes(blob[offset:offset + values.itemsize * length])
+        if len(values) != length:
+            raise ValueError("truncated file")
+        if sys.byteorder == 'big':
+            values.byteswap()
+        return values
+
+    def append_test(self, player: str, songs: List[str]) -> None:
+        """Append a graded test to the file. Call with the lock held, after `sync`."""
+        if self.offset == 0:
+            # No file yet: start it with a snapshot
+            self.save_stats()
+            return
+
+        data = b"".join([encode_name(player), SONG_COUNT.pack(len(songs))] + [encode_name(song) for song in songs])
+        try:
+            with open(self.stats_file, 'ab') as f:
+                f.write(data)
+        except Exception as e:
+            print(f"Error saving co-error statistics: {e}")
+            return
+        self.offset += len(data)
+        self.logged_tests += 1
+
+    def save_stats(self) -> None:
+        """Write a snapshot of the statistics, replacing the file atomically. Call with the lock held."""
+        rows = self.matrix.rows + [array('I')] * (len(self.songs) - len(self.matrix.rows))
+        row_lengths = array('I', (len(row) for row in rows))
+        row_columns = array('I')
+        for row in rows:
+            row_columns.extend(row)
+        history_lengths = array('H', (len(history) for history in self.histories.values()))
+        history_ids = array('I')
+        for history in self.histories.values():
+            history_ids.extend(history)
+
+        chunks = [HEADER.pack(FILE_MAGIC, FILE_VERSION, len(self.songs), len(self.matrix.keys),
+                              self.matrix.size, len(self.histories))]
+        for name in list(self.songs) + list(self.histories):
+            chunks.append(encode_name(name))
+        for values in (self.error_counts, self.matrix.keys, self.matrix.counts, row_lengths, row_columns,
+                       history_lengths, history_ids):
+            if sys.byteorder == 'big':
+                values = array(values.typecode, values)
+                values.byteswap()
+            chunks.append(values.tobytes())
+
+        temp_file = self.stats_file + ".tmp"
+        try:
+            with open(temp_file, 'wb') as f:
+                f.write(b"".join(chunks))
+            os.replace(temp_file, self.stats_file)
+            stat = os.stat(self.stats_file)
+        except Exception as e:
+            print(f"Error saving co-error statistics: {e}")
+            return
+
+        self.file_id = (stat.st_dev, stat.st_ino)
+        self.offset = stat.st_size
+        self.logged_tests = 0
+
+    def close(self) -> None:
+        """Write a new snapshot if tests were appended since the last one."""
+        with locked(self.stats_file):
+            self.sync()
+            if self.logged_tests:
+                self.save_stats()
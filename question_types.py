@@ -0,0 +1,358 @@
+import bisect
+import itertools
+import random
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+# Number of answer choices shown for every question type, and the range players can pick from
+NUM_CHOICES = 4
+MIN_CHOICES = 2
+MAX_CHOICES = 8
+
+# Random draws per distractor before falling back to listing the acceptable choices
+REJECTION_DRAWS = 4
+
+# Registries filled in by the decorators below
+INDEX_BUILDERS: Dict[str, Callable[[Dict], object]] = {}
+QUESTION_GENERATORS: Dict[str, type] = {}
+
+
+def index_builder(name: str):
+    """Register a function that builds a shared catalog index from the database."""
+    def decorator(func: Callable[[Dict], object]) -> Callable[[Dict], object]:
+        INDEX_BUILDERS[name] = func
+        return func
+    return decorator
+
+
+def register_question_type(cls: type) -> type:
+    """Register a question generator class under its `name`."""
+    QUESTION_GENERATORS[cls.name] = cls
+    return cls
+
+
+def build_indexes(data: Dict, names: Iterable[str], prebuilt: Optional[Dict] = None) -> Dict:
+    """Build each named index once so that all generators can share it."""
+    indexes = dict(prebuilt or {})
+    for name in names:
+        if name not in indexes:
+            indexes[name] = INDEX_BUILDERS[name](data)
+    return indexes
+
+
+def draw_distractors(pool: Sequence, count: int, reject: Callable[[object], bool]) -> List:
+    """Draw up to `count` distinct items of `pool` that are not rejected, in random order.
+
+    Items are drawn by random index and rejected on the spot, which takes
+    O(count) draws however big the pool is. When draws keep getting rejected
+    (a pool barely bigger than `count`, or one made mostly of rejected items)
+    the acceptable items are listed once and sampled instead. Returns fewer
+    than `count` items only if the pool does not have enough.
+    """
+    chosen = []
+    drawn = set()
+    if pool:
+        for _ in range(REJECTION_DRAWS * count):
+            if len(chosen) == count:
+                return chosen
+            item = pool[random.randrange(len(pool))]
+            if item not in drawn:
+                drawn.add(item)
+                if not reject(item):
+                    chosen.append(item)
+
+    if len(chosen) < count:
+        taken = set(chosen)
+        remaining = [item for item in pool if item not in taken and not reject(item)]
+        chosen.extend(random.sample(remaining, min(count - len(chosen), len(remaining))))
+    return chosen
+
+
+def required_indexes(question_types: Iterable[str]) -> List[str]:
+    """Collect the indexes needed by the given question types, without duplicates."""
+    names = []
+    for question_type in question_types:
+        for name in QUESTION_GENERATORS[question_type].required_indexes:
+            if name not in names:
+                names.append(name)
+    return names
+
+
+# ---------------------------------------------------------------------------
+# Catalog indexes
+# ---------------------------------------------------------------------------
+
+@index_builder("songs")
+def build_song_list(data: Dict) -> List[str]:
+    """All distinct song names in catalog order."""
+    return list(dict.fromkeys(song for songs in data["albums"].values() for song in songs))
+
+
+@index_builder("albums")
+def build_album_list(data: Dict) -> List[str]:
+    """All album names in catalog order."""
+    return list(data["albums"].keys())
+
+
+@index_builder("song_to_album")
+def build_song_to_album(data: Dict) -> Dict[str, str]:
+    """Mapping from song name to album name."""
+    return {song: album for album, songs in data["albums"].items() for song in songs}
+
+
+@index_builder("song_albums")
+def build_song_albums(data: Dict) -> Dict[str, List[str]]:
+    """Mapping from song name to every album it is on, in catalog order."""
+    song_albums: Dict[str, List[str]] = {}
+    for album, songs in data["albums"].items():
+        for song in dict.fromkeys(songs):
+            song_albums.setdefault(song, []).append(album)
+    return song_albums
+
+
+@index_builder("album_songs")
+def build_album_songs(data: Dict) -> Dict[str, List[str]]:
+    """Mapping from album name to its songs in track order."""
+    return {album: list(songs) for album, songs in data["albums"].items()}
+
+
+@index_builder("song_track")
+def build_song_track(data: Dict) -> Dict[str, int]:
+    """Mapping from song name to its (1-based) track number on its album."""
+    return {song: i for songs in data["albums"].values() for i, song in enumerate(songs, 1)}
+
+
+@index_builder("song_year")
+def build_song_year(data: Dict) -> Dict[str, str]:
+    """Mapping from song name to the release year of its album, where known."""
+    album_years = data.get("album_years", {})
+    return {song: str(album_years[album])
+            for album, songs in data["albums"].items() if album in album_years
+            for song in songs}
+
+
+@index_builder("years")
+def build_year_list(data: Dict) -> List[str]:
+    """Distinct release years of the albums in the catalog."""
+    album_years = data.get("album_years", {})
+    return sorted({str(album_years[album]) for album in data["albums"] if album in album_years})
+
+
+@index_builder("snippets")
+def build_snippets(data: Dict) -> Dict[str, str]:
+    """Mapping from song name to an intro/lyric snippet, for songs that have one."""
+    return {song: snippet for song, snippet in data.get("snippets", {}).items() if snippet}
+
+
+# ---------------------------------------------------------------------------
+# Question generators
+# ---------------------------------------------------------------------------
+
+class QuestionGenerator:
+    """Base class for question types.
+
+    Subclasses set `name`, `label` and `required_indexes`, and implement
+    `supports` and `build`. Every question is about a single song, so that
+    grading, retakes and notes work the same way for all types.
+
+    Questions get `num_choices` answer choices, or fewer (but at least
+    MIN_CHOICES) when the catalog does not have enough wrong answers.
+    """
+    name = ""
+    label = ""
+    required_indexes = ("song_to_album",)
+
+    def __init__(self, indexes: Dict, num_choices: int = NUM_CHOICES):
+        """Keep a reference to the shared catalog indexes."""
+        self.index = indexes
+        self.num_choices = num_choices
+        self.askable: Optional[bool] = None
+
+    def can_ask(self) -> bool:
+        """Check whether the catalog has enough for any question of this type (checked once)."""
+        if self.askable is None:
+            self.askable = self.check_catalog()
+        return self.askable
+
+    def check_catalog(self) -> bool:
+        """Catalog-level condition for `can_ask`: without it, `supports` is False for every song."""
+        return len(self.index["song_to_album"]) > 0
+
+    def supports(self, song: str) -> bool:
+        """Check whether a question of this type can be asked about the song."""
+        return True
+
+    def build(self, song: str) -> Dict:
+        """Build a question dict about the song."""
+        raise NotImplementedError
+
+    def make_question(self, song: str, prompt: str, correct_answer: str, wrong_choices: List[str]) -> Dict:
+        """Assemble a question dict with shuffled answer choices."""
+        answer_choices = wrong_choices + [correct_answer]
+        random.shuffle(answer_choices)
+        return {
+            'type': self.name,
+            'prompt': prompt,
+            'song': song,
+            'correct_answer': correct_answer,
+            'correct_album': self.index["song_to_album"][song],
+            'answer_choices': answer_choices,
+            'user_answer': None,
+            'is_correct': None
+        }
+
+
+@register_question_type
+class AlbumQuestion(QuestionGenerator):
+    """Which album does this song belong to?
+
+    With fewer albums than answer choices, asks which of some songs is on
+    the song's album instead, so small catalogs still get full questions.
+    """
+    name = "album"
+    label = "Song → album"
+    required_indexes = ("song_to_album", "song_albums", "albums", "songs", "album_songs")
+
+    def check_catalog(self) -> bool:
+        return len(self.index["albums"]) >= MIN_CHOICES and len(self.index["songs"]) > 0
+
+    def supports(self, song: str) -> bool:
+        albums = self.index["albums"]
+        if len(albums) >= self.num_choices:
+            # Some album must not contain the song (it can be on several)
+            return len(albums) > len(self.index["song_albums"][song])
+        # Song-level choices need a song from another album
+        own_songs = self.index["album_songs"][self.index["song_to_album"][song]]
+        return len(albums) >= MIN_CHOICES and len(self.index["songs"]) > len(own_songs)
+
+    def build(self, song: str) -> Dict:
+        correct_album = self.index["song_to_album"][song]
+        if len(self.index["albums"]) >= self.num_choices:
+            own_albums = self.index["song_albums"][song]
+            wrong_choices = draw_distractors(self.index["albums"], self.num_choices - 1,
+                                             lambda album: album in own_albums)
+            prompt = f"Which album does the song '{song}' belong to?"
+            return self.make_question(song, prompt, correct_album, wrong_choices)
+
+        wrong_choices = self.draw_songs_off_album(song, correct_album)
+        prompt = f"Which of these songs is on the album '{correct_album}'?"
+        return self.make_question(song, prompt, song, wrong_choices)
+
+    def draw_songs_off_album(self, song: str, album: str) -> List[str]:
+        """Draw wrong choices among the songs of the other albums.
+
+        Only used with fewer albums than choices, so the albums are few, but
+        one of them may hold most of the catalog: draw song positions across
+        the other albums instead of rejecting songs of `album`.
+        """
+        other_songs = [self.index["album_songs"][other] for other in self.index["albums"] if other != album]
+        ends = list(itertools.accumulate(len(songs) for songs in other_songs))
+
+        def song_at(position: int) -> str:
+            i = bisect.bisect_right(ends, position)
+            return other_songs[i][position - (ends[i - 1] if i else 0)]
+
+        # A song name can appear on several albums, including `album` itself
+        song_albums = self.index["song_albums"]
+        positions = draw_distractors(range(ends[-1]) if ends else [], self.num_choices - 1,
+                                     lambda position: album in song_albums[song_at(position)])
+        return list(dict.fromkeys(song_at(position) for position in positions))
+
+
+@register_question_type
+class ReleaseYearQuestion(QuestionGenerator):
+    """In which year was this song released?"""
+    name = "year"
+    label = "Song → release year"
+    required_indexes = ("song_to_album", "song_year", "years")
+
+    def check_catalog(self) -> bool:
+        return len(self.index["years"]) >= MIN_CHOICES
+
+    def supports(self, song: str) -> bool:
+        return song in self.index["song_year"] and len(self.index["years"]) >= MIN_CHOICES
+
+    def build(self, song: str) -> Dict:
+        correct_year = self.index["song_year"][song]
+        wrong_choices = draw_distractors(self.index["years"], self.num_choices - 1,
+                                         lambda year: year == correct_year)
+        prompt = f"In which year was the song '{song}' released?"
+        return self.make_question(song, prompt, correct_year, wrong_choices)
+
+
+@register_question_type
+class TrackOrderQuestion(QuestionGenerator):
+    """Which song is track N on this album?"""
+    name = "track_order"
+    label = "Album → track order"
+    required_indexes = ("song_to_album", "song_track", "album_songs")
+
+    def check_catalog(self) -> bool:
+        return any(len(songs) >= MIN_CHOICES for songs in self.index["album_songs"].values())
+
+    def supports(self, song: str) -> bool:
+        album = self.index["song_to_album"][song]
+        return len(self.index["album_songs"][album]) >= MIN_CHOICES
+
+    def build(self, song: str) -> Dict:
+        album = self.index["song_to_album"][song]
+        track = self.index["song_track"][song]
+        wrong_choices = draw_distractors(self.index["album_songs"][album], self.num_choices - 1,
+                                         lambda other: other == song)
+        prompt = f"Which song is track {track} on the album '{album}'?"
+        return self.make_question(song, prompt, song, wrong_choices)
+
+
+@register_question_type
+class NotOnAlbumQuestion(QuestionGenerator):
+    """Which of these songs is NOT on album X? (the song is the odd one out)"""
+    name = "not_on_album"
+    label = "Which song is NOT on the album"
+    required_indexes = ("song_to_album", "song_albums", "albums", "album_songs")
+
+    def __init__(self, indexes: Dict, num_choices: int = NUM_CHOICES):
+        super().__init__(indexes, num_choices)
+        self.albums_with_songs: Optional[int] = None
+
+    def count_albums_with_songs(self) -> int:
+        """Count the albums that have songs (counted once)."""
+        if self.albums_with_songs is None:
+            self.albums_with_songs = sum(1 for songs in self.index["album_songs"].values() if len(songs))
+        return self.albums_with_songs
+
+    def check_catalog(self) -> bool:
+        # Needs two albums with songs: one to ask about, one for the odd song out
+        return self.count_albums_with_songs() >= 2
+
+    def supports(self, song: str) -> bool:
+        # Some album with songs must not contain the song (it can be on several)
+        return self.count_albums_with_songs() > len(self.index["song_albums"][song])
+
+    def build(self, song: str) -> Dict:
+        own_albums = self.index["song_albums"][song]
+        album_songs = self.index["album_songs"]
+        album = draw_distractors(self.index["albums"], 1,
+                                 lambda other: other in own_albums or not album_songs[other])[0]
+        wrong_choices = draw_distractors(album_songs[album], self.num_choices - 1,
+                                         lambda other: other == song)
+        prompt = f"Which song is NOT on the album '{album}'?"
+        return self.make_question(song, prompt, song, wrong_choices)
+
+
+@register_question_type
+class SnippetQuestion(QuestionGenerator):
+    """Which song does this intro/lyric snippet come from?"""
+    name = "snippet"
+    label = "Intro/lyric snippet → song"
+    required_indexes = ("song_to_album", "songs", "snippets")
+
+    def check_catalog(self) -> bool:
+        return len(self.index["snippets"]) > 0 and len(self.index["songs"]) >= MIN_CHOICES
+
+    def supports(self, song: str) -> bool:
+        return song in self.index["snippets"] and len(self.index["songs"]) >= MIN_CHOICES
+
+    def build(self, song: str) -> Dict:
+        wrong_choices = draw_distractors(self.index["songs"], self.num_choices - 1,
+                                         lambda other: other == song)
+        prompt = f"Which song does this snippet come from?\n「{self.index['snippets'][song]}」"
+        return self.make_question(song, prompt, song, wrong_choices)
@@ -0,0 +1,122 @@
+import time
+from typing import Callable, Dict, List, Optional
+
+from quiz_timer import seconds_to_ns
+
+
+class QuizSession:
+    """Headless quiz session, for driving a (timed) test without a terminal.
+
+    Questions are answered one at a time with `submit`. Deadlines are checked
+    against `clock` whenever the session is used, so no background timer runs.
+    """
+
+    def __init__(self, quiz, num_questions: int, question_types: Optional[List[str]] = None,
+                 time_limit: Optional[float] = None, round_time_limit: Optional[float] = None,
+                 clock: Callable[[], int] = time.perf_counter_ns, player: Optional[str] = None):
+        """Generate the test questions; the clock starts with `start`."""
+        self.quiz = quiz
+        self.player = player
+        self.questions = quiz.generate_test(num_questions, question_types)
+        self.time_limit = time_limit
+        self.round_time_limit = round_time_limit
+        self.clock = clock
+        self.index = 0
+        self.started_ns = None
+        self.question_started_ns = None
+        self.finished_ns = None
+        self.ranks = None
+
+    def is_timed(self) -> bool:
+        """Check whether the session has a per-question or round time limit."""
+        return self.time_limit is not None or self.round_time_limit is not None
+
+    def start(self) -> Optional[Dict]:
+        """Start the round and return the first question."""
+        if self.is_timed():
+            self.started_ns = self.question_started_ns = self.clock()
+        return self.current_question()
+
+    def is_finished(self) -> bool:
+        """Check whether every question has been answered or has timed out."""
+        return self.index >= len(self.questions)
+
+    def current_question(self) -> Optional[Dict]:
+        """Get the question waiting for an answer, or None when the session is over."""
+        if self.is_timed():
+            self.expire_questions(self.clock())
+        if self.is_finished():
+            return None
+        return self.questions[self.index]
+
+    def submit(self, answer: str) -> bool:
+        """Answer the current question with one of its choices. Returns True if it was correct and in time."""
+        if self.is_finished():
+            raise ValueError("The session has no question left to answer")
+
+        if self.is_timed():
+            now_ns = self.clock()
+            self.expire_questions(now_ns)
+            if self.is_finished():
+                return False
+            self.check_choice(answer)
+            self.record_answer(answer, now_ns)
+        else:
+            self.check_choice(answer)
+            self.questions[self.index]['user_answer'] = answer
+            self.advance(None)
+
+        question = self.questions[self.index - 1]
+        return question['user_answer'] == question['correct_answer']
+
+    def check_choice(self, answer: str) -> None:
+        """Raise ValueError if the answer is not one of the current question's choices."""
+        if answer not in self.questions[self.index]['answer_choices']:
+            raise ValueError(f"'{answer}' is not one of the answer choices of the current question")
+
+    def question_deadline_ns(self) -> Optional[int]:
+        """Get the deadline of the current question, taking the round limit into account."""
+        deadlines = []
+        if self.time_limit is not None:
+            deadlines.append(self.question_started_ns + seconds_to_ns(self.time_limit))
+        if self.round_time_limit is not None:
+            deadlines.append(self.started_ns + seconds_to_ns(self.round_time_limit))
+        return min(deadlines) if deadlines else None
+
+    def expire_questions(self, now_ns: int) -> None:
+        """Mark every question whose deadline has passed as timed out."""
+        while not self.is_finished():
+            deadline_ns = self.question_deadline_ns()
+            if deadline_ns is None or now_ns < deadline_ns:
+                break
+            self.record_answer(None, deadline_ns)
+
+    def record_answer(self, answer: Optional[str], answered_ns: int) -> None:
+        """Store the answer and its latency on the current question and move on."""
+        question = self.questions[self.index]
+        question['user_answer'] = answer
+        question['latency_ns'] = answered_ns - self.question_started_ns
+        question['timed_out'] = answer is None
+        question['time_limit'] = self.time_limit
+        self.advance(answered_ns)
+
+    def advance(self, now_ns: Optional[int]) -> None:
+        """Move to the next question."""
+        self.index += 1
+        self.question_started_ns = now_ns
+        if self.is_finished():
+            self.finished_ns = now_ns
+
+    def results(self) -> Dict:
+        """Grade the session. Unanswered questions count as wrong.
+
+        Once the session is finished, its results are recorded on the leaderboards
+        and in the player's co-error statistics (only the first time), and the
+        ranks are kept in `ranks`.
+        """
+        results = self.quiz.grade_test(self.questions)
+        if self.is_timed() and self.finished_ns is not None:
+            results['round_time_ns'] = self.finished_ns - self.started_ns
+        if self.is_finished() and self.ranks is None:
+            self.ranks = self.quiz.record_results(results, self.player)
+        return results
@@ -0,0 +1,77 @@
+import os
+import sys
+import time
+from typing import Optional
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import select
+    import termios
+
+# How often the Windows console is polled for key presses
+POLL_INTERVAL = 0.05
+
+
+def seconds_to_ns(seconds: float) -> int:
+    """Convert seconds to nanoseconds for use with time.perf_counter_ns."""
+    return int(seconds * 1_000_000_000)
+
+
+def flush_input() -> None:
+    """Discard keys typed but not yet read, so that they don't answer the next prompt.
+
+    Only flushes a terminal: piped input is meant to be read.
+    """
+    if os.name == 'nt':
+        while msvcrt.kbhit():
+            msvcrt.getwch()
+    elif sys.stdin.isatty():
+        termios.tcflush(sys.stdin, termios.TCIFLUSH)
+
+
+def timed_input(prompt: str, timeout: float) -> Optional[str]:
+    """Read a line from stdin, giving up after `timeout` seconds.
+
+    Returns None on timeout. On Linux/macOS this waits on stdin with select,
+    on Windows it polls the console with msvcrt. Input typed before the
+    prompt or after the timeout is discarded.
+    """
+    flush_input()
+    print(prompt, end='', flush=True)
+
+    if os.name == 'nt':
+        return _timed_input_windows(timeout)
+
+    ready, _, _ = select.select([sys.stdin], [], [], max(timeout, 0))
+    if not ready:
+        print()
+        flush_input()
+        return None
+
+    line = sys.stdin.readline()
+    if not line:
+        raise EOFError
+    return line.rstrip('\n')
+
+
+def _timed_input_windows(timeout: float) -> Optional[str]:
+    """Read a line from the Windows console, giving up after `timeout` seconds."""
+    deadline = time.perf_counter() + timeout
+    chars = []
+    while time.perf_counter() < deadline:
+        while msvcrt.kbhit():
+            char = msvcrt.getwche()
+            if char in '\r\n':
+                print()
+                return ''.join(chars)
+            if char == '\b':
+                if chars:
+                    chars.pop()
+                    print(' \b', end='', flush=True)
+            else:
+                chars.append(char)
+        time.sleep(POLL_INTERVAL)
+    print()
+    flush_input()
+    return None
@@ -0,0 +1,197 @@
+import argparse
+import csv
+import json
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+from notes_manager import NotesManager
+
+# Every graded session is appended to this file, one JSON object per line
+HISTORY_FILE = "quiz_history.jsonl"
+
+# Columns of the per-answer export
+ANSWER_FIELDS = ['timestamp', 'player', 'kind', 'session', 'question', 'type', 'song',
+                 'user_answer', 'correct_answer', 'is_correct', 'latency_ms']
+
+
+def session_record(results: Dict, player: str, kind: str = "test") -> Dict:
+    """Build the history record of a graded session."""
+    return {
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'player': player,
+        'kind': kind,
+        'total_questions': results['total_questions'],
+        'correct_count': results['correct_count'],
+        'percentage': results['percentage'],
+        'results': results['results']
+    }
+
+
+def append_session(record: Dict, history_file: str = HISTORY_FILE) -> None:
+    """Append a session record to the history file."""
+    with open(history_file, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def iter_history(history_file: str = HISTORY_FILE) -> Iterator[Dict]:
+    """Stream the session records of the history file, one at a time."""
+    try:
+        with open(history_file, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"Error: Invalid JSON on line {line_number} of '{history_file}', skipped!")
+    except FileNotFoundError:
+        print(f"Error: History file '{history_file}' not found!")
+
+
+def iter_answer_rows(sessions: Iterable[Dict]) -> Iterator[Dict]:
+    """Flatten sessions into one row per answer."""
+    for session_number, session in enumerate(sessions, 1):
+        for question_number, result in enumerate(session['results'], 1):
+            latency_ns = result.get('latency_ns')
+            yield {
+                'timestamp': session['timestamp'],
+                'player': session['player'],
+                'kind': session['kind'],
+                'session': session_number,
+                'question': question_number,
+                'type': result.get('type', 'album'),
+                'song': result['song'],
+                'user_answer': result['user_answer'],
+                'correct_answer': result['correct_answer'],
+                'is_correct': result['is_correct'],
+                'latency_ms': round(latency_ns / 1e6, 3) if latency_ns is not None else None
+            }
+
+
+def write_csv(rows: Iterable[Dict], output_file: str) -> int:
+    """Stream rows to a CSV file. Returns the number of rows written."""
+    count = 0
+    with open(output_file, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=ANSWER_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def write_jsonl(rows: Iterable[Dict], output_file: str) -> int:
+    """Stream rows to a JSONL file. Returns the number of rows written."""
+    count = 0
+    with open(output_file, 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def iter_study_sheet(rows: Iterable[Dict], notes: Dict[str, str]) -> Iterator[str]:
+    """Stream the lines of a printable study sheet of wrong songs, joined with their notes.
+
+    Memory grows with the number of distinct missed songs, not with the
+    number of answers. Songs are listed by album, most missed first.
+    """
+    misses: Dict[str, list] = {}
+    for row in rows:
+        if not row['is_correct']:
+            entry = misses.setdefault(row['song'], [0, row['correct_answer'], row['type']])
+            entry[0] += 1
+
+    yield "🎵 JAY CHOU STUDY SHEET 🎵"
+    yield ""
+    if not misses:
+        yield "No wrong answers to study. 🎉"
+        return
+
+    yield f"{len(misses)} songs to study"
+    for i, (song, (count, correct_answer, question_type)) in enumerate(
+            sorted(misses.items(), key=lambda item: -item[1][0]), 1):
+        yield ""
+        yield f"{i:3d}. {song}  (missed {count}x)"
+        if question_type == 'album':
+            yield f"     📀 {correct_answer}"
+        else:
+            yield f"     ✓ {correct_answer}"
+        note = notes.get(song)
+        if note:
+            yield f"     💡 {note}"
+
+
+def write_lines(lines: Iterable[str], output_file: str) -> int:
+    """Stream text lines to a file. Returns the number of lines written."""
+    count = 0
+    with open(output_file, 'w', encoding='utf-8') as f:
+        for line in lines:
+            f.write(line + "\n")
+            count += 1
+    return count
+
+
+class ExportWorker:
+    """Background thread that runs export jobs in order, so the quiz never waits on disk I/O."""
+
+    def __init__(self):
+        """Start the worker thread."""
+        self.jobs: queue.Queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="results-export", daemon=True)
+        self.thread.start()
+
+    def submit(self, func: Callable, *args) -> None:
+        """Queue an export job."""
+        self.jobs.put((func, args))
+
+    def run(self) -> None:
+        """Run queued jobs until `close` is called."""
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            func, args = job
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"Error exporting results: {e}")
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Finish the queued jobs and stop the worker thread."""
+        if self.thread.is_alive():
+            self.jobs.put(None)
+            self.thread.join(timeout)
+
+
+def main():
+    """Main function to export the quiz history."""
+    parser = argparse.ArgumentParser(description="Export the Jay Chou quiz history.")
+    parser.add_argument("format", choices=["csv", "jsonl", "study"],
+                        help="csv/jsonl: one row per answer, study: printable study sheet of wrong songs")
+    parser.add_argument("output", help="file to write")
+    parser.add_argument("--history", default=HISTORY_FILE, help="history file to export")
+    parser.add_argument("--notes", default=None, help="notes file for the study sheet")
+    parser.add_argument("--player", default=None, help="only export this player's sessions")
+    args = parser.parse_args()
+
+    sessions = iter_history(args.history)
+    if args.player is not None:
+        sessions = (session for session in sessions if session['player'] == args.player)
+    rows = iter_answer_rows(sessions)
+
+    if args.format == "csv":
+        count = write_csv(rows, args.output)
+        print(f"Exported {count} answers to '{args.output}'")
+    elif args.format == "jsonl":
+        count = write_jsonl(rows, args.output)
+        print(f"Exported {count} answers to '{args.output}'")
+    else:
+        notes_manager = NotesManager(args.notes) if args.notes else NotesManager()
+        write_lines(iter_study_sheet(rows, notes_manager.get_notes()), args.output)
+        print(f"Study sheet saved to '{args.output}'")
+
+if __name__ == "__main__":
+    main()
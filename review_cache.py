@@ -0,0 +1,100 @@
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional
+
+
+class LRUCache:
+    """A small least-recently-used cache with hit/miss counters.
+
+    The cache holds at most `max_entries` values and, if `max_size` is given,
+    values whose total `sizeof` is at most `max_size`.
+    """
+
+    def __init__(self, max_entries: int = 128, max_size: Optional[int] = None,
+                 sizeof: Callable[[object], int] = len):
+        """Initialize an empty cache."""
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.size = 0
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.entries
+
+    def get(self, key: Hashable) -> Optional[object]:
+        """Get a cached value, marking it as recently used. Returns None on a miss."""
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: object) -> None:
+        """Store a value, evicting the least recently used entries if the cache is full."""
+        self.pop(key)
+        self.entries[key] = value
+        if self.max_size is not None:
+            self.size += self.sizeof(value)
+        while len(self.entries) > self.max_entries or (self.max_size is not None and self.size > self.max_size):
+            _, evicted = self.entries.popitem(last=False)
+            if self.max_size is not None:
+                self.size -= self.sizeof(evicted)
+
+    def pop(self, key: Hashable) -> Optional[object]:
+        """Remove and return a cached value."""
+        value = self.entries.pop(key, None)
+        if value is not None and self.max_size is not None:
+            self.size -= self.sizeof(value)
+        return value
+
+    def clear(self) -> None:
+        """Remove all cached values."""
+        self.entries.clear()
+        self.size = 0
+
+    def hit_rate(self) -> float:
+        """Share of lookups that were hits."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class AlbumReviewCache:
+    """Cache of rendered album review pages, keyed by (album, notes version of the album).
+
+    Each album has its own notes version, bumped by the notes manager's change
+    listener when the note of one of its songs changes, so editing a note only
+    invalidates the pages of the albums the song is on.
+    """
+
+    def __init__(self, notes_manager, song_albums: Dict[str, List[str]],
+                 render: Callable[[str, List[str], Dict[str, str]], str], max_entries: int = 128):
+        """Subscribe to note changes of `notes_manager`."""
+        self.notes_manager = notes_manager
+        self.song_albums = song_albums
+        self.render = render
+        self.album_versions: Dict[str, int] = {}
+        self.pages = LRUCache(max_entries)
+        notes_manager.add_listener(self.on_note_changed)
+
+    def on_note_changed(self, song: str) -> None:
+        """Invalidate the page of every album the song is on."""
+        for album in self.song_albums.get(song, ()):
+            version = self.album_versions.get(album, 0)
+            self.pages.pop((album, version))
+            self.album_versions[album] = version + 1
+
+    def get_page(self, album: str, songs: List[str]) -> str:
+        """Get the rendered review page of an album, rendering it on a cache miss."""
+        key = (album, self.album_versions.get(album, 0))
+        page = self.pages.get(key)
+        if page is None:
+            page = self.render(album, songs, self.notes_manager.get_notes())
+            self.pages.put(key, page)
+        return page
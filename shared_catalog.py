@@ -0,0 +1,557 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from array import array
+from collections.abc import Mapping, Sequence
+from typing import Dict, Iterator, List, Optional
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:
+    # Python < 3.8
+    resource_tracker = shared_memory = None
+
+from jay_chou_quiz import JayChouQuiz
+
+# Segment layout (all integers are native u32, sections in this order):
+#   header
+#   string offsets (string count + 1): strings are the songs, then the albums, then the snippets
+#   album of each song
+#   first song of each album (album count + 1): songs are stored album by album, so a song
+#     name on several albums (or twice on one) has a song id for each time it appears
+#   previous song id with the same name (NO_SONG for the first)
+#   last song id of each distinct song name, in order of first appearance
+#   release year of each album (0 when unknown)
+#   snippet string id of each song (NO_STRING when the song has none)
+#   song lookup table: open addressing on crc32 of the UTF-8 name, storing the last song id + 1
+#   album lookup table: the same, storing album id + 1
+#   UTF-8 string blob
+SEGMENT_MAGIC = b"JCSC"
+SEGMENT_VERSION = 4
+HEADER = struct.Struct("=4sHxxIIIIIII")
+NO_STRING = 0xFFFFFFFF
+NO_SONG = 0xFFFFFFFF
+
+# Questions per test run by the report workers, as in the quiz
+TEST_SIZE = 20
+
+
+def table_capacity(count: int) -> int:
+    """Capacity of a lookup table: a power of two at least twice the number of names."""
+    capacity = 16
+    while capacity < count * 2:
+        capacity *= 2
+    return capacity
+
+
+def build_lookup_table(encoded_names: List[bytes]) -> array:
+    """Build an open-addressing table from crc32 of each name to its index + 1.
+
+    A name that appears more than once maps to its last index, as the
+    catalog indexes resolve songs on several albums to the last one.
+    """
+    capacity = table_capacity(len(encoded_names))
+    mask = capacity - 1
+    table = array('I', bytes(4 * capacity))
+    for i, encoded in enumerate(encoded_names):
+        slot = zlib.crc32(encoded) & mask
+        while table[slot]:
+            if encoded_names[table[slot] - 1] == encoded:
+                break
+            slot = (slot + 1) & mask
+        table[slot] = i + 1
+    return table
+
+
+def encode_catalog(data: Dict) -> bytes:
+    """Encode a catalog into the shared segment layout."""
+    albums = list(data["albums"].keys())
+    album_years = data.get("album_years", {})
+    snippets = data.get("snippets", {})
+
+    songs = []
+    song_album = array('I')
+    song_previous = array('I')
+    album_first_song = array('I', [0])
+    last_song_ids: Dict[str, int] = {}
+    for album_index, album in enumerate(albums):
+        for song in data["albums"][album]:
+            song_previous.append(last_song_ids.get(song, NO_SONG))
+            last_song_ids[song] = len(songs)
+            songs.append(song)
+            song_album.append(album_index)
+        album_first_song.append(len(songs))
+    distinct_songs = array('I', last_song_ids.values())
+
+    # Intern the snippets: songs sharing a text share its string
+    texts: Dict[str, int] = {}
+    first_text_id = len(songs) + len(albums)
+    song_snippets = array('I')
+    for song in songs:
+        text = snippets.get(song)
+        song_snippets.append(texts.setdefault(text, first_text_id + len(texts)) if text else NO_STRING)
+
+    encoded = [string.encode('utf-8') for string in songs + albums + list(texts)]
+    string_offsets = array('I', [0])
+    total = 0
+    for string in encoded:
+        total += len(string)
+        string_offsets.append(total)
+
+    song_table = build_lookup_table(encoded[:len(songs)])
+    album_table = build_lookup_table(encoded[len(songs):len(songs) + len(albums)])
+    years = array('I', (int(album_years.get(album, 0)) for album in albums))
+    header = HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION, len(songs), len(distinct_songs), len(albums),
+                         len(encoded), total, len(song_table), len(album_table))
+    return b"".join([header, string_offsets.tobytes(), song_album.tobytes(), album_first_song.tobytes(),
+                     song_previous.tobytes(), distinct_songs.tobytes(), years.tobytes(), song_snippets.tobytes(),
+                     song_table.tobytes(), album_table.tobytes(), b"".join(encoded)])
+
+
+class SharedCatalog:
+    """Read-only view of a catalog stored in shared memory.
+
+    The parent process builds the segment once with `create`; worker processes
+    `attach` to it by name and read strings straight from the shared buffer,
+    so their memory use does not grow with the catalog. `indexes` exposes the
+    segment as the catalog indexes of the question types, so that a
+    `JayChouQuiz(catalog=...)` runs on it without loading its own copy.
+    Notes are not part of the segment: they change while the quiz runs, so
+    each quiz keeps them in its notes file as usual.
+    """
+
+    def __init__(self, segment, owner: bool = False):
+        """Parse the segment layout."""
+        self.segment = segment
+        self.owner = owner
+        buffer = segment.buf.toreadonly()
+        self.buffer = buffer
+
+        (magic, version, song_count, distinct_count, album_count, string_count, blob_size,
+         song_capacity, album_capacity) = HEADER.unpack_from(buffer, 0)
+        if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION:
+            raise ValueError(f"'{segment.name}' is not a shared catalog")
+        self.song_count = song_count
+        self.album_count = album_count
+
+        self.views = []
+        offset = HEADER.size
+        self.string_offsets, offset = self.u32_view(offset, string_count + 1)
+        self.song_album, offset = self.u32_view(offset, song_count)
+        self.album_first_song, offset = self.u32_view(offset, album_count + 1)
+        self.song_previous, offset = self.u32_view(offset, song_count)
+        self.distinct_songs, offset = self.u32_view(offset, distinct_count)
+        self.album_years, offset = self.u32_view(offset, album_count)
+        self.song_snippets, offset = self.u32_view(offset, song_count)
+        self.song_table, offset = self.u32_view(offset, song_capacity)
+        self.album_table, offset = self.u32_view(offset, album_capacity)
+        self.blob = buffer[offset:offset + blob_size]
+        self.views.append(self.blob)
+
+    def u32_view(self, offset: int, length: int):
+        """View `length` u32 values of the segment starting at `offset`."""
+        view = self.buffer[offset:offset + 4 * length].cast('I')
+        self.views.append(view)
+        return view, offset + 4 * length
+
+    @classmethod
+    def create(cls, data: Dict, name: Optional[str] = None) -> "SharedCatalog":
+        """Build a catalog into a new shared memory segment."""
+        if shared_memory is None:
+            raise RuntimeError("Shared catalogs need Python 3.8 or higher")
+        encoded = encode_catalog(data)
+        segment = shared_memory.SharedMemory(name=name, create=True, size=len(encoded))
+        segment.buf[:len(encoded)] = encoded
+        return cls(segment, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedCatalog":
+        """Attach to a catalog segment built by another process."""
+        if shared_memory is None:
+            raise RuntimeError("Shared catalogs need Python 3.8 or higher")
+        # Only the creating process may unlink the segment, so workers must not
+        # register it with the resource tracker (which unlinks it at exit)
+        if sys.version_info >= (3, 13):
+            segment = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            register = resource_tracker.register
+            resource_tracker.register = lambda name, rtype: None
+            try:
+                segment = shared_memory.SharedMemory(name=name)
+            finally:
+                resource_tracker.register = register
+        return cls(segment)
+
+    @property
+    def name(self) -> str:
+        """Name of the shared memory segment, to pass to workers."""
+        return self.segment.name
+
+    def close(self) -> None:
+        """Detach from the segment, and remove it if this process created it.
+
+        Quizzes running on the catalog must not be used afterwards.
+        """
+        for view in self.views:
+            view.release()
+        self.buffer.release()
+        self.segment.close()
+        if self.owner:
+            self.segment.unlink()
+
+    def get_string(self, string_id: int) -> str:
+        """Decode a string of the segment."""
+        return str(self.blob[self.string_offsets[string_id]:self.string_offsets[string_id + 1]], 'utf-8')
+
+    def get_song(self, song_id: int) -> str:
+        """Get a song name."""
+        return self.get_string(song_id)
+
+    def get_album(self, album_id: int) -> str:
+        """Get an album name."""
+        return self.get_string(self.song_count + album_id)
+
+    def get_album_of_song(self, song_id: int) -> int:
+        """Get the album id of a song."""
+        return self.song_album[song_id]
+
+    def get_song_albums(self, song_id: int) -> List[int]:
+        """Get the ids of every album with the song's name, in catalog order."""
+        album_ids = []
+        while song_id != NO_SONG:
+            album_id = self.song_album[song_id]
+            # A song twice on an album is listed once
+            if not album_ids or album_ids[-1] != album_id:
+                album_ids.append(album_id)
+            song_id = self.song_previous[song_id]
+        album_ids.reverse()
+        return album_ids
+
+    def get_album_songs(self, album_id: int) -> range:
+        """Get the song ids of an album, in track order."""
+        return range(self.album_first_song[album_id], self.album_first_song[album_id + 1])
+
+    def get_album_year(self, album_id: int) -> Optional[int]:
+        """Get the release year of an album, if known."""
+        return self.album_years[album_id] or None
+
+    def get_snippet(self, song_id: int) -> str:
+        """Get the intro/lyric snippet of a song, or an empty string."""
+        snippet_id = self.song_snippets[song_id]
+        return "" if snippet_id == NO_STRING else self.get_string(snippet_id)
+
+    def lookup(self, table, first_string_id: int, name: str) -> Optional[int]:
+        """Find the index of a name in a lookup table whose strings start at `first_string_id`."""
+        encoded = name.encode('utf-8')
+        mask = len(table) - 1
+        slot = zlib.crc32(encoded) & mask
+        while True:
+            entry = table[slot]
+            if not entry:
+                return None
+            string_id = first_string_id + entry - 1
+            if self.blob[self.string_offsets[string_id]:self.string_offsets[string_id + 1]] == encoded:
+                return entry - 1
+            slot = (slot + 1) & mask
+
+    def find_song(self, song: str) -> Optional[int]:
+        """Find the id of a song by name (its last appearance, for a song on several albums)."""
+        return self.lookup(self.song_table, 0, song)
+
+    def find_album(self, album: str) -> Optional[int]:
+        """Find the id of an album by name."""
+        return self.lookup(self.album_table, self.song_count, album)
+
+    def indexes(self) -> Dict:
+        """Views of the segment under the names and interfaces of the question-type indexes."""
+        return {
+            "songs": SongNames(self, self.distinct_songs),
+            "albums": AlbumNames(self),
+            "song_to_album": SongAlbums(self),
+            "song_albums": SongAlbumLists(self),
+            "album_songs": AlbumSongs(self),
+            "song_track": SongTracks(self),
+            "song_year": SongYears(self),
+            "years": sorted({str(year) for year in self.album_years if year}),
+            "snippets": SongSnippets(self)
+        }
+
+
+# ---------------------------------------------------------------------------
+# Index views: read straight from the segment, nothing is copied per worker
+# ---------------------------------------------------------------------------
+
+class SongNames(Sequence):
+    """Names of a sequence of song ids (the distinct songs of the catalog, or an album's tracks)."""
+
+    def __init__(self, catalog: SharedCatalog, song_ids: Sequence[int]):
+        self.catalog = catalog
+        self.song_ids = song_ids
+
+    def __len__(self) -> int:
+        return len(self.song_ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.catalog.get_song(song_id) for song_id in self.song_ids[i]]
+        return self.catalog.get_song(self.song_ids[i])
+
+
+class AlbumNames(Sequence):
+    """Album names in catalog order."""
+
+    def __init__(self, catalog: SharedCatalog):
+        self.catalog = catalog
+
+    def __len__(self) -> int:
+        return self.catalog.album_count
+
+    def __getitem__(self, i):
+        album_ids = range(self.catalog.album_count)
+        if isinstance(i, slice):
+            return [self.catalog.get_album(album_id) for album_id in album_ids[i]]
+        return self.catalog.get_album(album_ids[i])
+
+
+class SongMapping(Mapping):
+    """Read-only mapping keyed by song name; subclasses implement `value`.
+
+    A song on several albums is looked up by its last song id, as the catalog
+    indexes keep the last album of a song.
+    """
+
+    def __init__(self, catalog: SharedCatalog):
+        self.catalog = catalog
+
+    def value(self, song_id: int):
+        """Value of a song id. Raises KeyError if the song has none."""
+        raise NotImplementedError
+
+    def __getitem__(self, song: str):
+        song_id = self.catalog.find_song(song)
+        if song_id is None:
+            raise KeyError(song)
+        return self.value(song_id)
+
+    def __iter__(self) -> Iterator[str]:
+        for song_id in self.catalog.distinct_songs:
+            try:
+                self.value(song_id)
+            except KeyError:
+                continue
+            yield self.catalog.get_song(song_id)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+
+class SongAlbums(SongMapping):
+    """Mapping from song name to album name."""
+
+    def value(self, song_id: int) -> str:
+        return self.catalog.get_album(self.catalog.get_album_of_song(song_id))
+
+    def __len__(self) -> int:
+        return len(self.catalog.distinct_songs)
+
+
+class SongAlbumLists(SongMapping):
+    """Mapping from song name to every album it is on, in catalog order."""
+
+    def value(self, song_id: int) -> List[str]:
+        return [self.catalog.get_album(album_id) for album_id in self.catalog.get_song_albums(song_id)]
+
+    def __len__(self) -> int:
+        return len(self.catalog.distinct_songs)
+
+
+class SongTracks(SongMapping):
+    """Mapping from song name to its (1-based) track number on its album."""
+
+    def value(self, song_id: int) -> int:
+        album_id = self.catalog.get_album_of_song(song_id)
+        return song_id - self.catalog.album_first_song[album_id] + 1
+
+    def __len__(self) -> int:
+        return len(self.catalog.distinct_songs)
+
+
+class SongYears(SongMapping):
+    """Mapping from song name to the release year of its album, where known."""
+
+    def value(self, song_id: int) -> str:
+        # The last album of the song with a known year
+        other = song_id
+        while other != NO_SONG:
+            year = self.catalog.get_album_year(self.catalog.get_album_of_song(other))
+            if year is not None:
+                return str(year)
+            other = self.catalog.song_previous[other]
+        raise KeyError(song_id)
+
+
+class SongSnippets(SongMapping):
+    """Mapping from song name to its intro/lyric snippet, for songs that have one."""
+
+    def value(self, song_id: int) -> str:
+        snippet = self.catalog.get_snippet(song_id)
+        if not snippet:
+            raise KeyError(song_id)
+        return snippet
+
+
+class AlbumSongs(Mapping):
+    """Mapping from album name to the names of its songs in track order."""
+
+    def __init__(self, catalog: SharedCatalog):
+        self.catalog = catalog
+
+    def __getitem__(self, album: str) -> SongNames:
+        album_id = self.catalog.find_album(album)
+        if album_id is None:
+            raise KeyError(album)
+        return SongNames(self.catalog, self.catalog.get_album_songs(album_id))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(AlbumNames(self.catalog))
+
+    def __len__(self) -> int:
+        return self.catalog.album_count
+
+
+def read_memory_usage() -> Dict[str, float]:
+    """Get the memory use of this process in MB: total RSS, and its shared-memory part on Linux."""
+    usage = {}
+    try:
+        with open("/proc/self/status", 'r') as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "RssAnon", "RssShmem"):
+                    usage[key] = int(value.split()[0]) / 1024
+    except OSError:
+        import resource
+        # ru_maxrss is in KB on Linux and in bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        usage["VmRSS"] = max_rss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return usage
+
+
+def run_worker(mode: str, source: str, num_questions: int, results: multiprocessing.Queue) -> None:
+    """Worker process: start a quiz on the catalog (attached or loaded), run tests, and report memory use."""
+    started_ns = time.perf_counter_ns()
+    baseline = read_memory_usage()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        if mode == "shared":
+            catalog = SharedCatalog.attach(source)
+            quiz = JayChouQuiz(catalog=catalog)
+        else:
+            # What every worker does without a shared catalog: load its own copy
+            catalog = None
+            quiz = JayChouQuiz(source)
+    startup_ms = (time.perf_counter_ns() - started_ns) / 1e6
+
+    # Mixed tests, answered at random, graded and retaken
+    questions = 0
+    question_types = quiz.get_question_types()
+    while questions < num_questions:
+        test_questions = quiz.generate_test(min(TEST_SIZE, num_questions - questions), question_types)
+        if not test_questions:
+            break
+        for question in test_questions:
+            question['user_answer'] = random.choice(question['answer_choices'])
+        results_of_test = quiz.grade_test(test_questions)
+        quiz.generate_retake_test(results_of_test['wrong_questions'])
+        questions += len(test_questions)
+
+    usage = read_memory_usage()
+    results.put({
+        'pid': os.getpid(),
+        'startup_ms': startup_ms,
+        'questions': questions,
+        'rss_mb': usage.get("VmRSS"),
+        'private_mb': usage.get("RssAnon"),
+        'shared_mb': usage.get("RssShmem"),
+        'rss_growth_mb': usage.get("VmRSS", 0) - baseline.get("VmRSS", 0)
+    })
+
+    quiz.close()
+    if catalog is not None:
+        catalog.close()
+
+
+def report_workers(mode: str, source: str, num_workers: int, num_questions: int) -> List[Dict]:
+    """Start `num_workers` worker processes and collect their memory reports."""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    workers = [context.Process(target=run_worker, args=(mode, source, num_questions, results))
+               for _ in range(num_workers)]
+    for worker in workers:
+        worker.start()
+    reports = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    return reports
+
+
+def main():
+    """Main function to compare per-worker memory use of shared and copied catalogs."""
+    parser = argparse.ArgumentParser(description="Share the catalog between quiz worker processes.")
+    parser.add_argument("--database", default="jay_chou_database.json", help="catalog file")
+    parser.add_argument("--synthetic", type=int, default=None,
+                        help="use a synthetic catalog with this many songs instead")
+    parser.add_argument("--workers", type=int, default=4, help="number of worker processes")
+    parser.add_argument("--questions", type=int, default=1000, help="questions asked per worker")
+    args = parser.parse_args()
+
+    if shared_memory is None:
+        print("Error: Shared catalogs need Python 3.8 or higher!")
+        return
+
+    if args.synthetic is not None:
+        from synthetic_catalog import generate_catalog
+        data = generate_catalog(args.synthetic)
+    else:
+        with open(args.database, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+    # Workers run in a scratch directory, so that their quizzes keep their side files (notes, leaderboards, ...) there
+    work_dir = tempfile.TemporaryDirectory()
+    catalog_file = os.path.join(work_dir.name, "catalog.json")
+    with open(catalog_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+    started_ns = time.perf_counter_ns()
+    catalog = SharedCatalog.create(data)
+    build_ms = (time.perf_counter_ns() - started_ns) / 1e6
+    print("🎵 JAY CHOU SHARED CATALOG 🎵")
+    print(f"{len(catalog.distinct_songs):,} songs, {catalog.album_count:,} albums: "
+          f"{catalog.segment.size / 1024 / 1024:.1f} MB segment built in {build_ms:.0f} ms")
+
+    original_dir = os.getcwd()
+    os.chdir(work_dir.name)
+    try:
+        for mode, source in (("copy", catalog_file), ("shared", catalog.name)):
+            print(f"\n{mode.upper()} catalog, {args.workers} workers:")
+            print(f"{'pid':>8} {'startup ms':>11} {'RSS MB':>8} {'private MB':>11} {'shared MB':>10}")
+            for report in report_workers(mode, source, args.workers, args.questions):
+                private = f"{report['private_mb']:.1f}" if report['private_mb'] is not None else "-"
+                shared = f"{report['shared_mb']:.1f}" if report['shared_mb'] is not None else "-"
+                print(f"{report['pid']:>8} {report['startup_ms']:>11.1f} {report['rss_mb']:>8.1f} "
+                      f"{private:>11} {shared:>10}")
+    finally:
+        os.chdir(original_dir)
+        catalog.close()
+        work_dir.cleanup()
+
+if __name__ == "__main__":
+    main()
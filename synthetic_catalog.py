@@ -0,0 +1,94 @@
+import argparse
+import json
+import random
+from typing import Dict, Optional
+
+# Characters common in Mandarin song and album titles
+TITLE_CHARACTERS = (
+    "爱你我他她的是不了在有人这中大来上个们到说时要就出会可也以后天年生能心"
+    "好看起发当没成只如事把还用第样道想作种开美总从无情己面最女但现前些所同"
+    "日手又行意动方期它头经长儿回位分战新花风雨雪夜月星光梦海山云水城火龙"
+    "晴香蓝色白黑红青春秋冬夏歌曲听唱舞乐琴钢吉他鼓声音曲调时间过去未来"
+    "世界故事传说英雄骑士公主王子女孩男孩妈妈爸爸爷爷奶奶朋友兄弟恋人"
+)
+
+# Decorations occasionally added to titles
+TITLE_SUFFIXES = ("", "", "", "", " (Live)", " (Remix)", "之歌", "的故事", "2.0")
+
+# Share of albums that are compilations/box sets, and their size multiplier
+GIANT_ALBUM_SHARE = 0.02
+GIANT_ALBUM_FACTOR = 20
+
+
+def random_title(rng: random.Random, min_length: int = 2, max_length: int = 6) -> str:
+    """Generate a random CJK title."""
+    length = rng.randint(min_length, max_length)
+    return "".join(rng.choice(TITLE_CHARACTERS) for _ in range(length)) + rng.choice(TITLE_SUFFIXES)
+
+
+def unique_title(rng: random.Random, used: set) -> str:
+    """Generate a random CJK title that is not in `used`, and add it."""
+    title = random_title(rng)
+    if title in used:
+        title = f"{title} {len(used)}"
+    used.add(title)
+    return title
+
+
+def generate_catalog(num_songs: int, min_album_size: int = 8, max_album_size: int = 14,
+                     giant_album_share: float = GIANT_ALBUM_SHARE, seed: Optional[int] = 0) -> Dict:
+    """Generate a synthetic catalog with `num_songs` unique songs in the database format."""
+    rng = random.Random(seed)
+    albums = {}
+    album_years = {}
+    used_albums = set()
+    used_songs = set()
+    year = 2000
+
+    remaining = num_songs
+    while remaining > 0:
+        album_size = rng.randint(min_album_size, max_album_size)
+        if rng.random() < giant_album_share:
+            album_size *= GIANT_ALBUM_FACTOR
+        album_size = min(album_size, remaining)
+
+        album = unique_title(rng, used_albums)
+        albums[album] = [unique_title(rng, used_songs) for _ in range(album_size)]
+        album_years[album] = year
+        year += rng.randint(0, 1)
+        remaining -= album_size
+
+    return {"albums": albums, "album_years": album_years}
+
+
+def generate_notes(catalog: Dict, share: float = 0.1, seed: Optional[int] = 0) -> Dict:
+    """Generate synthetic notes for a share of the catalog's songs, in the notes database format."""
+    rng = random.Random(seed)
+    notes = {}
+    for album, songs in catalog["albums"].items():
+        for song in songs:
+            if rng.random() < share:
+                notes[song] = f"{random_title(rng, 4, 12)} — {album}"
+    return {"notes": notes}
+
+
+def main():
+    """Main function to write a synthetic catalog file."""
+    parser = argparse.ArgumentParser(description="Generate a synthetic Jay Chou style catalog.")
+    parser.add_argument("num_songs", type=int, help="number of songs")
+    parser.add_argument("--output", default="synthetic_database.json", help="catalog file to write")
+    parser.add_argument("--min-album-size", type=int, default=8, help="smallest regular album")
+    parser.add_argument("--max-album-size", type=int, default=14, help="largest regular album")
+    parser.add_argument("--giant-album-share", type=float, default=GIANT_ALBUM_SHARE,
+                        help="share of compilation/box set albums")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+
+    catalog = generate_catalog(args.num_songs, args.min_album_size, args.max_album_size,
+                               args.giant_album_share, args.seed)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(catalog, f, ensure_ascii=False, indent=2)
+    print(f"Wrote {len(catalog['albums'])} albums and {args.num_songs} songs to '{args.output}'")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import os
+import tempfile
+import unittest
+
+from leaderboards import SPARSE_RANK_LIMIT, Leaderboard, LeaderboardStore
+
+
+def expected_rank(scores, percentage):
+    """Rank computed directly: 1 + the number of scores in a strictly higher 0.1% bucket."""
+    return 1 + sum(1 for score in scores if round(score * 10) > round(percentage * 10))
+
+
+class LeaderboardRankTest(unittest.TestCase):
+    def test_rank_across_sparse_limit(self):
+        scores = []
+        board = Leaderboard()
+        # Sparse ranks up to the limit, then the Fenwick tree is built on the first rank query past it
+        for i in range(SPARSE_RANK_LIMIT + 20):
+            percentage = (i * 37) % 101
+            scores.append(percentage)
+            self.assertEqual(board.add(percentage), expected_rank(scores, percentage))
+            for query in (0, 12.3, 50, 99.9, 100):
+                self.assertEqual(board.rank(query), expected_rank(scores, query))
+        self.assertIsNotNone(board.fenwick)
+
+    def test_first_rank_after_reload(self):
+        with tempfile.TemporaryDirectory() as work_dir:
+            leaderboard_file = os.path.join(work_dir, "leaderboards.bin")
+            results = {'total_questions': 1, 'results': []}
+
+            store = LeaderboardStore(leaderboard_file)
+            for percentage in range(101):
+                store.record({**results, 'percentage': percentage}, {})
+            store.close()
+
+            # The reloaded board has more than SPARSE_RANK_LIMIT buckets and no Fenwick tree yet
+            store = LeaderboardStore(leaderboard_file)
+            self.assertEqual(store.record({**results, 'percentage': 50}, {})["*"], (51, 102))
+            self.assertEqual(store.record({**results, 'percentage': 50}, {})["*"], (51, 103))
+
+
+if __name__ == "__main__":
+    unittest.main()